@@ -0,0 +1,123 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Copyright © 2014 Damien Nicolas <damien@gordon.re>
+#
+# Distributed under terms of the MIT license.
+
+"""
+Generates synthetic T++ decks for the benchmarks
+"""
+
+import sys
+import random
+import argparse
+
+WORDS = ('lorem ipsum dolor sit amet consectetur adipiscing elit sed do '
+         'eiusmod tempor incididunt ut labore et dolore magna aliqua').split()
+
+# relative weight of every kind of line in a generated page
+DEFAULT_MIX = {
+    'text': 60,
+    'heading': 4,
+    'center': 6,
+    'right': 2,
+    'horline': 2,
+    'output': 6,
+    'wait': 4,
+    'style': 8,
+    'huge': 4,
+    'exec': 2,
+    'comment': 2,
+}
+
+
+def sentence(rng, length):
+    words = []
+    size = 0
+    while size < length:
+        word = rng.choice(WORDS)
+        words.append(word)
+        size += len(word) + 1
+    return ' '.join(words)[:length]
+
+
+def page_lines(rng, kinds, weights, lines_per_page, line_length):
+    for i in range(lines_per_page):
+        kind = rng.choices(kinds, weights)[0]
+        if kind == 'text':
+            yield sentence(rng, line_length)
+        elif kind in ('heading', 'center', 'right'):
+            yield '--%s %s' % (kind, sentence(rng, line_length // 2))
+        elif kind == 'horline':
+            yield '--horline'
+        elif kind == 'output':
+            yield '--beginoutput'
+            for j in range(rng.randint(1, 4)):
+                yield sentence(rng, line_length)
+            yield '--endoutput'
+        elif kind == 'wait':
+            yield '---'
+        elif kind == 'style':
+            style = rng.choice(('ul', 'bold', 'rev'))
+            yield '--%son' % style
+            yield sentence(rng, line_length)
+            yield '--%soff' % style
+        elif kind == 'huge':
+            yield '--huge %s' % sentence(rng, 12)
+        elif kind == 'exec':
+            yield '--exec echo %s' % sentence(rng, 20)
+        elif kind == 'comment':
+            yield '--## %s' % sentence(rng, 30)
+
+
+def generate(pages=100, lines_per_page=20, line_length=70, mix=None,
+             seed=0):
+    """Yields the lines of a deck of _pages_ pages, each of them holding
+    about _lines_per_page_ lines of about _line_length_ characters, drawn
+    according to the weights of _mix_.
+    """
+    rng = random.Random(seed)
+    mix = dict(DEFAULT_MIX, **(mix or {}))
+    kinds = sorted(mix)
+    weights = [mix[k] for k in kinds]
+    yield '--title Synthetic deck'
+    yield '--author deckgen'
+    yield '--date 01 Jan 2014'
+    for number in range(pages):
+        yield '--newpage slide %s' % (number + 1)
+        yield '--heading %s' % sentence(rng, 40)
+        for line in page_lines(rng, kinds, weights, lines_per_page,
+                               line_length):
+            yield line
+
+
+def parse_mix(text):
+    """Parses a KIND=WEIGHT[,KIND=WEIGHT...] directive mix
+    """
+    mix = {}
+    for item in text.split(','):
+        kind, weight = item.split('=')
+        if kind not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError('unknown line kind: %s' % kind)
+        mix[kind] = int(weight)
+    return mix
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generate a synthetic T++ '
+                                     'deck')
+    parser.add_argument('-p', '--pages', type=int, default=100)
+    parser.add_argument('-l', '--lines', type=int, default=20,
+                        help='lines per page')
+    parser.add_argument('-w', '--width', type=int, default=70,
+                        help='length of text lines')
+    parser.add_argument('-m', '--mix', type=parse_mix,
+                        help='weights of line kinds, e.g. text=80,huge=0 '
+                        '(kinds: %s)' % ', '.join(sorted(DEFAULT_MIX)))
+    parser.add_argument('-s', '--seed', type=int, default=0)
+    results = parser.parse_args()
+    for line in generate(results.pages, results.lines, results.width,
+                         results.mix, results.seed):
+        sys.stdout.write(line + '\n')
@@ -0,0 +1,213 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Copyright © 2014 Damien Nicolas <damien@gordon.re>
+#
+# Distributed under terms of the MIT license.
+
+"""
+Benchmarks the stages of T++ on synthetic decks: parsing, directive dispatch,
+text export, export to every format in one pass, ncurses widget construction
+and start-up of a t++ process. figlet and --exec are stubbed out so that only
+T++ itself is measured. Results are written as JSON, and can be
+compared with the results of a previous run.
+"""
+
+import os
+import io
+import sys
+import json
+import time
+import platform
+import argparse
+import tempfile
+import statistics
+import subprocess
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+import deckgen
+import tplusplus.execcache
+import tplusplus.figlet
+from tplusplus.core import FileParser, DIRECTIVES
+from tplusplus.controllers import ConversionController
+from tplusplus.visualizers.tppvisualizer import TppVisualizer
+from tplusplus.visualizers.textvisualizer import TextVisualizer
+
+
+def stub_figlet(text, font, width):
+    return ' _ \n|_|\n| |\n', True
+
+
+def stub_command(cmdline, timeout=None, cwd=None, env=None):
+    return '%s\n' % cmdline, True
+
+
+def noop(self, *args):
+    pass
+
+
+class NullVisualizer(TppVisualizer):
+    """Visualizer whose handlers do nothing, to measure dispatching alone"""
+
+    print_line = noop
+    do_wait = noop
+    new_page = noop
+
+
+for _name in [name for name, needs_arg in DIRECTIVES.values()] + \
+        ['do_footer', 'do_header', 'do_date']:
+    if _name.startswith('do_'):
+        setattr(NullVisualizer, _name, noop)
+
+
+def bench_parse(deck):
+    FileParser(io.StringIO(deck)).get_pages()
+
+
+def bench_dispatch(deck):
+    vis = NullVisualizer()
+    for line in deck.split('\n'):
+        vis.visualize(line, False)
+
+
+def bench_text(deck):
+    ctrl = ConversionController(io.StringIO(deck), io.StringIO(),
+                                TextVisualizer)
+    ctrl.run()
+    ctrl.vis.flush()
+
+
+def bench_fanout(deck):
+    from tplusplus.visualizers import get, EXPORT_TYPES
+    from tplusplus.visualizers.fanoutvisualizer import FanoutVisualizer
+    outputs = [(get(type), io.StringIO(), None) for type in EXPORT_TYPES]
+    ctrl = ConversionController(io.StringIO(deck), outputs, FanoutVisualizer)
+    ctrl.run()
+    for vis in ctrl.vis.visualizers:
+        vis.flush()
+
+
+def headless_screen():
+    """Returns an urwid screen which renders to HTML fragments in memory
+    instead of a terminal
+    """
+    try:
+        from urwid.html_fragment import HtmlGenerator
+    except ImportError:
+        from urwid.display.html_fragment import HtmlGenerator
+    return HtmlGenerator()
+
+
+def bench_ncurses(deck, size=(80, 24)):
+    import urwid
+    from tplusplus.visualizers.ncursesvisualizer import NcursesVisualizer
+    screen = headless_screen()
+    screen.register_palette(NcursesVisualizer.palette)
+    ctrl = ConversionController(io.StringIO(deck), None, NcursesVisualizer)
+    ctrl.run()
+    vis = ctrl.vis
+    vis.prerenderer.shutdown()
+    vis.finish_loading()
+    for number in range(len(vis.pages)):
+        widgets = vis.build_page(number)[0]
+        canvas = urwid.Filler(urwid.Pile(widgets), valign='top').render(size)
+        screen.draw_screen(size, canvas)
+    del screen.fragments[:]
+
+
+def bench_startup(deck):
+    """Runs t++ on a one-line deck, which measures mostly the interpreter
+    start-up and the imports of the text mode
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        source = os.path.join(directory, 'startup.tpp')
+        with open(source, 'wt') as f:
+            f.write('--title startup\nhello\n')
+        subprocess.check_call([sys.executable, os.path.join(ROOT, 't++'),
+                               '--no-cache', '-t', 'text', '-o', os.devnull,
+                               source])
+
+
+BENCHMARKS = {
+    'parse': bench_parse,
+    'dispatch': bench_dispatch,
+    'fanout': bench_fanout,
+    'text': bench_text,
+    'ncurses': bench_ncurses,
+    'startup': bench_startup,
+}
+
+
+def measure(fn, deck, repeat):
+    runs = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        fn(deck)
+        runs.append(time.perf_counter() - start)
+    return {'min': min(runs), 'median': statistics.median(runs),
+            'runs': runs}
+
+
+def compare(results, previous, out=sys.stdout):
+    out.write('%-10s %12s %12s %8s\n' % ('benchmark', 'previous', 'current',
+                                        'ratio'))
+    for name, result in sorted(results['results'].items()):
+        old = previous['results'].get(name)
+        if old is None:
+            continue
+        out.write('%-10s %11.4fs %11.4fs %7.2fx\n' %
+                  (name, old['min'], result['min'],
+                   result['min'] / old['min'] if old['min'] else 0))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark T++')
+    parser.add_argument('-p', '--pages', type=int, default=200)
+    parser.add_argument('-l', '--lines', type=int, default=20,
+                        help='lines per page')
+    parser.add_argument('-w', '--width', type=int, default=70,
+                        help='length of text lines')
+    parser.add_argument('-m', '--mix', type=deckgen.parse_mix,
+                        help='weights of line kinds, e.g. text=80,huge=0')
+    parser.add_argument('-r', '--repeat', type=int, default=5)
+    parser.add_argument('-b', '--bench', action='append',
+                        choices=sorted(BENCHMARKS),
+                        help='only run BENCH (may be repeated)')
+    parser.add_argument('-o', '--output', metavar='FILE',
+                        help='write the results as JSON to FILE')
+    parser.add_argument('-c', '--compare', metavar='FILE',
+                        type=argparse.FileType('rt'),
+                        help='compare with the JSON results in FILE')
+    results = parser.parse_args()
+
+    tplusplus.figlet.run_figlet = stub_figlet
+    tplusplus.execcache.run_command = stub_command
+    deck = '\n'.join(deckgen.generate(results.pages, results.lines,
+                                      results.width, results.mix))
+
+    report = {
+        'meta': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'pages': results.pages,
+            'lines': results.lines,
+            'width': results.width,
+            'mix': results.mix,
+            'repeat': results.repeat,
+        },
+        'results': {},
+    }
+    for name in results.bench or sorted(BENCHMARKS):
+        result = measure(BENCHMARKS[name], deck, results.repeat)
+        report['results'][name] = result
+        sys.stdout.write('%-10s min %.4fs  median %.4fs\n' %
+                         (name, result['min'], result['median']))
+
+    if results.output:
+        with open(results.output, 'wt') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+    if results.compare:
+        compare(report, json.load(results.compare))
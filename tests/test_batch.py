@@ -0,0 +1,65 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Copyright © 2014 Damien Nicolas <damien@gordon.re>
+#
+# Distributed under terms of the MIT license.
+
+"""
+Tests of the conversion of decks into an output directory
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..'))
+
+from tplusplus.batch import convert_file
+from tplusplus.core import TplusplusException
+
+
+class ConvertFileTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def write(self, name, text):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w') as f:
+            f.write(text)
+        return path
+
+    def test_output(self):
+        source = self.write('deck.tpp', 'hello\n')
+        destination = os.path.join(self.directory, 'out', 'deck.txt')
+        convert_file(source, destination, use_cache=False)
+        with open(destination) as f:
+            self.assertIn('hello\n', f.read())
+        self.assertEqual(os.listdir(os.path.dirname(destination)),
+                         ['deck.txt'])
+
+    def test_error_leaves_no_output(self):
+        source = self.write('deck.tpp', '--include nowhere.tpp\n')
+        destination = os.path.join(self.directory, 'deck.txt')
+        with self.assertRaises(TplusplusException):
+            convert_file(source, destination, use_cache=False)
+        self.assertEqual(os.listdir(self.directory), ['deck.tpp'])
+
+    def test_error_keeps_previous_output(self):
+        source = self.write('deck.tpp', '--include nowhere.tpp\n')
+        destination = self.write('deck.txt', 'previous\n')
+        with self.assertRaises(TplusplusException):
+            convert_file(source, destination, use_cache=False)
+        with open(destination) as f:
+            self.assertEqual(f.read(), 'previous\n')
+        self.assertEqual(sorted(os.listdir(self.directory)),
+                         ['deck.tpp', 'deck.txt'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Copyright © 2014 Damien Nicolas <damien@gordon.re>
+#
+# Distributed under terms of the MIT license.
+
+"""
+Tests of --include resolution and of the caches of parsed decks
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..'))
+
+from tplusplus.cache import CompileCache
+from tplusplus.core import FileParser, IncludeCache, TplusplusException
+
+
+class IncludeTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.cache = CompileCache(os.path.join(self.directory, 'cache'))
+
+    def write(self, name, text):
+        path = os.path.join(self.directory, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            f.write(text)
+        return path
+
+    def parse(self, name, cache=None, includes=None):
+        with open(os.path.join(self.directory, name)) as f:
+            parser = FileParser(f, includes or IncludeCache())
+            return [page.ops for page in parser.get_pages(cache)]
+
+    def test_relative_to_includer(self):
+        self.write('deck.tpp', '--include parts/ch.tpp\n')
+        self.write('parts/ch.tpp', 'chapter\n--include sub/sec.tpp\n')
+        self.write('parts/sub/sec.tpp', 'section\n')
+        self.assertEqual(self.parse('deck.tpp'),
+                         [[('text', 'chapter'), ('text', 'section')]])
+
+    def test_cycle(self):
+        self.write('a.tpp', '--include b.tpp\n')
+        self.write('b.tpp', '--include a.tpp\n')
+        with self.assertRaises(TplusplusException) as context:
+            self.parse('a.tpp')
+        self.assertIn('include cycle', str(context.exception))
+
+    def test_missing(self):
+        self.write('deck.tpp', '--include nowhere.tpp\n')
+        with self.assertRaises(TplusplusException):
+            self.parse('deck.tpp')
+
+    def test_cache_invalidated_by_include(self):
+        self.write('deck.tpp', '--include ch.tpp\n')
+        self.write('ch.tpp', 'one\n')
+        self.assertEqual(self.parse('deck.tpp', self.cache),
+                         [[('text', 'one')]])
+        self.write('ch.tpp', 'two, with another size\n')
+        self.assertEqual(self.parse('deck.tpp', self.cache),
+                         [[('text', 'two, with another size')]])
+
+    def test_cache_reused(self):
+        path = self.write('deck.tpp', '--include ch.tpp\n')
+        self.write('ch.tpp', 'one\n')
+        self.parse('deck.tpp', self.cache)
+        with open(path) as f:
+            digest = self.cache.digest(f, os.path.realpath(self.directory))
+            parser = FileParser(f, IncludeCache())
+            self.assertIsNotNone(self.cache.load(digest,
+                                                 parser.check_cached))
+
+    def test_same_text_other_directory(self):
+        for name in ('a', 'b'):
+            self.write('%s/deck.tpp' % name, '--include ch.tpp\n')
+            self.write('%s/ch.tpp' % name, 'chapter %s\n' % name)
+        self.assertEqual(self.parse('a/deck.tpp', self.cache),
+                         [[('text', 'chapter a')]])
+        self.assertEqual(self.parse('b/deck.tpp', self.cache),
+                         [[('text', 'chapter b')]])
+
+    def test_include_cache_version(self):
+        includes = IncludeCache(os.path.join(self.directory, 'items'))
+        path = self.write('ch.tpp', 'chapter\n')
+        digest, items = includes.read(path)
+        self.assertTrue(os.path.exists(includes.path(digest)))
+        IncludeCache.VERSION += 1
+        self.addCleanup(setattr, IncludeCache, 'VERSION',
+                        IncludeCache.VERSION - 1)
+        self.assertIsNone(includes.load(digest))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Copyright © 2014 Damien Nicolas <damien@gordon.re>
+#
+# Distributed under terms of the MIT license.
+
+"""
+Tests of the escaping of slide text by the Markdown visualizer
+"""
+
+import io
+import os
+import sys
+import unittest
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..'))
+
+from tplusplus.visualizers.markdownvisualizer import MarkdownVisualizer, \
+    escape
+
+
+class EscapeTest(unittest.TestCase):
+
+    def test_plain(self):
+        self.assertEqual(escape('v1.2 costs 3 (or 4)'), 'v1.2 costs 3 (or 4)')
+
+    def test_inline(self):
+        self.assertEqual(escape('*a* _b_ `c` [d] \\'),
+                         '\\*a\\* \\_b\\_ \\`c\\` \\[d\\] \\\\')
+
+    def test_html(self):
+        self.assertEqual(escape('<b>x</b> &amp;'), '\\<b\\>x\\</b\\> \\&amp;')
+
+    def test_block_markers(self):
+        self.assertEqual(escape('# a'), '\\# a')
+        self.assertEqual(escape('> a'), '\\> a')
+        self.assertEqual(escape('- a'), '\\- a')
+        self.assertEqual(escape('  + a'), '  \\+ a')
+        self.assertEqual(escape('1. a'), '1\\. a')
+        self.assertEqual(escape('12) a'), '12\\) a')
+        self.assertEqual(escape('==='), '\\===')
+
+
+class MarkdownVisualizerTest(unittest.TestCase):
+
+    def convert(self, ops):
+        output = io.StringIO()
+        vis = MarkdownVisualizer(output)
+        for opcode, arg in ops:
+            vis.execute(opcode, arg)
+        vis.flush()
+        return output.getvalue()
+
+    def test_text(self):
+        self.assertEqual(self.convert([('title', '# T'),
+                                       ('heading', '*H*'),
+                                       ('text', '1. item')]),
+                         '# \\# T\n\n## \\*H\\*\n\n1\\. item  \n')
+
+    def test_output_block(self):
+        self.assertEqual(self.convert([('beginoutput', None),
+                                       ('text', '# *x*'),
+                                       ('endoutput', None)]),
+                         '```\n# *x*\n```\n')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Copyright © 2014 Damien Nicolas <damien@gordon.re>
+#
+# Distributed under terms of the MIT license.
+
+"""
+Tests of the conversion of decks on several processes
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..'))
+
+from tplusplus import execcache
+from tplusplus.controllers import ConversionController
+from tplusplus.controllers.conversioncontroller import PageOutput
+from tplusplus.visualizers import TextVisualizer
+
+# the output block of the first slide goes on over the next ones, and the
+# same command runs on several slides: its output is the pid of the shell
+DECK = '''first
+--beginoutput
+--exec echo $$
+--newpage
+still in the block
+--exec echo $$
+--newpage
+--endoutput
+out of the block
+--newpage
+--exec echo $$
+--beginoutput
+--exec echo $$
+--endoutput
+'''
+
+
+class ParallelTest(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, 'deck.tpp')
+        with open(self.path, 'w') as f:
+            f.write(DECK)
+        execcache.configure()
+        self.addCleanup(execcache.configure)
+
+    def convert(self, jobs):
+        output = PageOutput()
+        with open(self.path) as input:
+            ctrl = ConversionController(input, output, TextVisualizer,
+                                        jobs=jobs, chunk_size=1)
+            ctrl.run()
+            ctrl.close()
+        return output.getvalue()
+
+    def test_same_output(self):
+        # the serial conversion reuses the outputs of the commands run for
+        # the parallel one
+        parallel = self.convert(2)
+        self.assertEqual(parallel, self.convert(1))
+
+    def test_commands_run_once(self):
+        output = self.convert(2).split('\n')
+        pids = set(line for line in output if line.lstrip('| ').isdigit())
+        self.assertEqual(len(pids), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
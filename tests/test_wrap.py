@@ -0,0 +1,70 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Copyright © 2014 Damien Nicolas <damien@gordon.re>
+#
+# Distributed under terms of the MIT license.
+
+"""
+Tests of the word wrapping engine
+"""
+
+import os
+import sys
+import unittest
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..'))
+
+from tplusplus.wrap import text_width, wrap
+
+
+class WrapTest(unittest.TestCase):
+
+    def test_empty(self):
+        self.assertEqual(wrap('', 10), ())
+
+    def test_fits(self):
+        self.assertEqual(wrap('abc def', 7), ('abc def',))
+
+    def test_break_at_space(self):
+        self.assertEqual(wrap('abc def ghi', 7), ('abc def', 'ghi'))
+
+    def test_long_word(self):
+        self.assertEqual(wrap('abcdefghij', 4), ('abcd', 'efgh', 'ij'))
+
+    def test_double_space(self):
+        self.assertEqual(wrap('abc  def', 3), ('abc', 'def'))
+        self.assertEqual(wrap('abc  def', 4), ('abc', 'def'))
+        self.assertEqual(wrap('abc  def', 5), ('abc', 'def'))
+        self.assertEqual(wrap('abc   def ghi', 7), ('abc', 'def ghi'))
+
+    def test_trailing_spaces(self):
+        self.assertEqual(wrap('abc   ', 3), ('abc',))
+
+    def test_leading_spaces(self):
+        self.assertEqual(wrap('  abc def', 5), ('  abc', 'def'))
+        self.assertEqual(wrap('  abc def', 3), ('  a', 'bc', 'def'))
+
+    def test_wide_characters(self):
+        self.assertEqual(wrap('漢字漢字', 4), ('漢字', '漢字'))
+        self.assertEqual(wrap('漢字漢字', 3), ('漢', '字', '漢', '字'))
+        self.assertEqual(wrap('ab 漢字', 4), ('ab', '漢字'))
+        self.assertEqual(wrap('漢字  ab', 4), ('漢字', 'ab'))
+
+    def test_combining_characters(self):
+        self.assertEqual(wrap('éé ab', 2), ('éé',
+                                                        'ab'))
+
+    def test_lines_fit(self):
+        text = 'Lorem  ipsum 漢字 dolor   sit amet, consectetur adipiscing'
+        for width in range(1, 20):
+            lines = wrap(text, width)
+            for line in lines:
+                self.assertLessEqual(text_width(line), max(width, 2))
+            for line in lines[1:]:
+                self.assertFalse(line.startswith(' '))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Copyright © 2014 Damien Nicolas <damien@gordon.re>
+#
+# Distributed under terms of the MIT license.
+
+"""
+Converts many T++ files at once on a pool of worker processes
+"""
+
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from tplusplus.cache import CompileCache, default_cache_dir
+from tplusplus.controllers import ConversionController
+from tplusplus.core import include_cache
+from tplusplus import execcache
+from tplusplus.figlet import figlet_cache
+from tplusplus.visualizers import TextVisualizer
+
+
+def find_decks(paths, extension='.tpp'):
+    """Yields (source, relative output name) tuples for every file in
+    _paths_, looking for files ending with _extension_ in directories.
+    """
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.endswith(extension):
+                        source = os.path.join(root, name)
+                        yield source, os.path.relpath(source, path)
+        else:
+            yield path, os.path.basename(path)
+
+
+def output_path(output_dir, name, suffix='.txt'):
+    return os.path.join(output_dir, os.path.splitext(name)[0] + suffix)
+
+
+def output_key(path):
+    return os.path.normcase(os.path.abspath(path))
+
+
+def convert_file(source, destination, cache_dir=None, use_cache=True,
+                 figlet_cache_dir=None, flush_threshold=65536,
+                 exec_settings=None):
+    """Converts the T++ file _source_ into the text file _destination_
+    """
+    figlet_cache.directory = figlet_cache_dir
+    if exec_settings is not None:
+        execcache.configure(**exec_settings)
+    cache = None
+    if use_cache:
+        cache = CompileCache(cache_dir)
+        include_cache.directory = (os.path.join(cache_dir, 'includes')
+                                   if cache_dir
+                                   else default_cache_dir('includes'))
+    os.makedirs(os.path.dirname(destination) or '.', exist_ok=True)
+    # the output only replaces _destination_ once complete, so that a failed
+    # conversion leaves neither an empty nor a partial file behind
+    tmp = '%s.%s.tmp' % (destination, os.getpid())
+    try:
+        with open(source, 'rt') as input, open(tmp, 'wt') as output:
+            options = {'flush_threshold': flush_threshold}
+            ctrl = ConversionController(input, output, TextVisualizer,
+                                        cache=cache,
+                                        visualizer_options=options)
+            ctrl.run()
+            ctrl.close()
+        os.replace(tmp, destination)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def convert_batch(paths, output_dir, jobs=None, progress=sys.stderr,
+                  **options):
+    """Converts every deck found in _paths_ into _output_dir_ using _jobs_
+    worker processes (one per core by default), reporting progress and errors
+    on _progress_. Returns the number of decks which could not be converted.
+    """
+    decks = [(source, output_path(output_dir, name))
+             for source, name in find_decks(paths)]
+    sources = {}
+    for source, destination in decks:
+        sources.setdefault(output_key(destination), []).append(source)
+    failures = 0
+    done = 0
+    # decks which would overwrite each other's output are not converted
+    for key, clashing in sorted(sources.items()):
+        if len(clashing) > 1:
+            for source in clashing:
+                failures += 1
+                done += 1
+                progress.write('[%s/%s] %s: error: %s is the output of %s '
+                               'decks\n' % (done, len(decks), source, key,
+                                            len(clashing)))
+    with ProcessPoolExecutor(max_workers=jobs or os.cpu_count()) as pool:
+        futures = {}
+        for source, destination in decks:
+            if len(sources[output_key(destination)]) > 1:
+                continue
+            future = pool.submit(convert_file, source, destination, **options)
+            futures[future] = source
+        for done, future in enumerate(as_completed(futures), done + 1):
+            error = future.exception()
+            if error is None:
+                progress.write('[%s/%s] %s\n' % (done, len(decks),
+                                                 futures[future]))
+            else:
+                failures += 1
+                progress.write('[%s/%s] %s: error: %s\n' %
+                               (done, len(decks), futures[future], error))
+            progress.flush()
+    return failures
@@ -0,0 +1,142 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Copyright © 2014 Damien Nicolas <damien@gordon.re>
+#
+# Distributed under terms of the MIT license.
+
+"""
+On-disk caches for T++
+"""
+
+import os
+import hashlib
+import pickle
+import tempfile
+
+
+def default_cache_dir(name):
+    """Returns the directory in which the cache _name_ is stored by default,
+    following the XDG base directory specification.
+    """
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join('~', '.cache')
+    return os.path.join(os.path.expanduser(base), 'tplusplus', name)
+
+
+class CompileCache:
+    """Stores the compiled pages of a deck on disk, keyed by the hash of its
+    source and of the directory its includes are resolved from. Each cache file is a stream of pickled records (a header, one
+    Page per page and a final None), so that pages can be written and read
+    back one at a time. The files the deck includes are listed, along with
+    their digests, in a separate file.
+    """
+
+    VERSION = 2
+
+    def __init__(self, directory=None):
+        self.directory = directory or default_cache_dir('compiled')
+
+    def digest(self, f, directory=''):
+        """Returns the hexadecimal SHA-256 digest of _directory_ and of the
+        content of the file object _f_ and rewinds it, or None if _f_ cannot
+        be rewound.
+        """
+        try:
+            if not f.seekable():
+                return None
+            start = f.tell()
+        except (AttributeError, OSError):
+            return None
+        h = hashlib.sha256(directory.encode('utf-8', 'surrogateescape') +
+                           b'\0')
+        for chunk in iter(lambda: f.read(65536), ''):
+            h.update(chunk.encode('utf-8', 'surrogateescape'))
+        f.seek(start)
+        return h.hexdigest()
+
+    def path(self, digest, suffix='.pages'):
+        return os.path.join(self.directory, digest + suffix)
+
+    def load(self, digest, check=None):
+        """Returns a generator over the cached pages of the deck identified by
+        _digest_, or None if the deck is not in the cache, or if _check_
+        returns False for the list of its (included path, digest) tuples.
+        """
+        if check is not None:
+            try:
+                with open(self.path(digest, '.deps'), 'rb') as f:
+                    dependencies = pickle.load(f)
+            except OSError:
+                dependencies = []
+            except Exception:
+                return None
+            if not check(dependencies):
+                return None
+        try:
+            f = open(self.path(digest), 'rb')
+        except OSError:
+            return None
+        try:
+            header = pickle.load(f)
+        except Exception:
+            f.close()
+            return None
+        if header != (self.VERSION, digest):
+            f.close()
+            return None
+        return self._read_pages(f)
+
+    def _read_pages(self, f):
+        with f:
+            while True:
+                page = pickle.load(f)
+                if page is None:
+                    break
+                yield page
+
+    def store(self, digest, pages, dependencies=None):
+        """Passes the Page objects of _pages_ through, writing them to the
+        cache as they go by. The cache file only becomes visible once all the
+        pages have been consumed; _dependencies_ is then called to get the
+        list of included files.
+        """
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        except OSError:
+            # the cache is not writable, simply parse without it
+            yield from pages
+            return
+        complete = False
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump((self.VERSION, digest), f, pickle.HIGHEST_PROTOCOL)
+                for page in pages:
+                    pickle.dump(page, f, pickle.HIGHEST_PROTOCOL)
+                    yield page
+                pickle.dump(None, f, pickle.HIGHEST_PROTOCOL)
+            try:
+                self.store_dependencies(digest, dependencies() if dependencies
+                                        else [])
+                os.replace(tmp, self.path(digest))
+                complete = True
+            except OSError:
+                pass
+        finally:
+            if not complete:
+                try:
+                    os.unlink(tmp)
+                except OSError:
+                    pass
+
+    def store_dependencies(self, digest, dependencies):
+        path = self.path(digest, '.deps')
+        if not dependencies:
+            if os.path.exists(path):
+                os.unlink(path)
+            return
+        tmp = '%s.%s.tmp' % (path, os.getpid())
+        with open(tmp, 'wb') as f:
+            pickle.dump(dependencies, f, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
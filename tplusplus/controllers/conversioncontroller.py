@@ -14,29 +14,182 @@ The non-interactive controller for T++
 import sys
 sys.path.append('../..')
 
+from time import perf_counter
+from itertools import islice
+from collections import deque
 from tplusplus.core import FileParser
+from tplusplus.figlet import figlet_cache
 from tplusplus.controllers.tppcontroller import TppController
 
 
+class NullOutput:
+    """Output discarding everything written to it"""
+
+    def write(self, text):
+        pass
+
+    def close(self):
+        pass
+
+
+class PageOutput:
+    """Output keeping everything written to it in memory"""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, text):
+        self.chunks.append(text)
+
+    def close(self):
+        pass
+
+    def getvalue(self):
+        return ''.join(self.chunks)
+
+
+class ExecOutputs:
+    """Stands for the ExecCache of a visualizer, with the outputs of the
+    --exec commands already run by the parent process
+    """
+
+    def __init__(self, outputs):
+        self.outputs = outputs
+
+    def run(self, cmdline, cwd=None):
+        return self.outputs[cmdline]
+
+
+def init_worker(figlet_cache_dir):
+    figlet_cache.directory = figlet_cache_dir
+
+
+def render_pages(visualizer_class, visualizer_options, state, pages,
+                 exec_outputs):
+    """Renders _pages_ with a new visualizer starting from _state_, and
+    returns the output. The --exec commands of the pages get their output
+    from _exec_outputs_.
+    """
+    output = PageOutput()
+    options = dict(visualizer_options, exec_cache=ExecOutputs(exec_outputs))
+    vis = visualizer_class(output, **options)
+    vis.set_state(state)
+    execute = vis.execute
+    for p in pages:
+        for opcode, arg in p:
+            execute(opcode, arg)
+        vis.new_page()
+    vis.close()
+    return output.getvalue()
+
+
 class ConversionController(TppController):
     """Implements a non-interactive controller to control non-interactive
     visualizers (i.e. those that are used for converting T++ source code into
     another format)."""
 
-    def __init__(self, input, output, visualizer_class):
-        parser = FileParser(input)
-        self.pages = parser.get_pages()
-        self.vis = visualizer_class(output)
+    def __init__(self, input, output, visualizer_class, streaming=True,
+                 cache=None, watch=False, visualizer_options=None,
+                 profiler=None, pages=None, jobs=1, chunk_size=32):
+        self.input = input
+        self.output = output
+        self.cache = cache
+        self.profiler = profiler
+        if pages is not None:
+            # already parsed, e.g. kept by the render daemon
+            self.pages = pages
+        elif streaming:
+            # pages are parsed lazily while run() consumes them
+            self.pages = FileParser(input).iter_pages(cache)
+        else:
+            self.pages = FileParser(input).get_pages(cache)
+        self.visualizer_class = visualizer_class
+        self.visualizer_options = visualizer_options or {}
+        self.vis = visualizer_class(output, **self.visualizer_options)
+        # pages are rendered by _jobs_ processes, _chunk_size_ at a time,
+        # when the visualizer allows it (and nothing is profiled)
+        self.jobs = jobs
+        self.chunk_size = chunk_size
+        if watch:
+            self.vis.watch(input.name, self.reload)
+        if profiler is not None:
+            profiler.instrument(self.vis)
+            profiler.start()
+
+    def reload(self):
+        """Parses the source file again and returns its pages
+        """
+        with open(self.input.name, 'rt') as f:
+            return FileParser(f).get_pages(self.cache)
 
     def run(self):
-        for p in self.pages:
-            while 1:
-                line = p.next_line()
-                eop = p.eop
-                self.vis.visualize(line, eop)
-                if eop:
-                    break
-            self.vis.new_page()
+        if self.jobs > 1 and self.vis.PARALLEL_PAGES and \
+                self.profiler is None:
+            return self.run_parallel()
+        for p in self.vis.prepare(self.pages):
+            if self.profiler is None:
+                self.render_page(p)
+            else:
+                start = perf_counter()
+                self.render_page(p)
+                self.profiler.record_page(p.title, perf_counter() - start)
+
+    def iter_chunks(self):
+        """Yields (starting state, pages, exec outputs) tuples of consecutive
+        pages. The state is computed by a visualizer which only executes the
+        ops of STATE_OPCODES, and writes nowhere. The --exec commands are run
+        here, like in a serial conversion, so that every command runs once
+        whatever the chunk it is in.
+        """
+        tracker = self.visualizer_class(NullOutput(),
+                                        **self.visualizer_options)
+        state_opcodes = tracker.STATE_OPCODES
+        pages = iter(self.vis.prepare(self.pages))
+        while True:
+            chunk = list(islice(pages, self.chunk_size))
+            if not chunk:
+                return
+            outputs = {}
+            for p in chunk:
+                for opcode, arg in p:
+                    if opcode == 'exec' and arg not in outputs:
+                        outputs[arg] = self.vis.exec_output(arg)
+            yield tracker.get_state(), chunk, outputs
+            for p in chunk:
+                for opcode, arg in p:
+                    if opcode in state_opcodes:
+                        tracker.execute(opcode, arg)
+                tracker.new_page()
+
+    def run_parallel(self):
+        """Renders chunks of pages in worker processes, and writes their
+        output in order. At most two chunks per worker are pending, so that
+        memory use does not grow with the size of the deck.
+        """
+        # only loaded by the conversions which use several processes
+        from concurrent.futures import ProcessPoolExecutor
+
+        pending = deque()
+        with ProcessPoolExecutor(max_workers=self.jobs,
+                                 initializer=init_worker,
+                                 initargs=(figlet_cache.directory,)) as pool:
+            for state, chunk, outputs in self.iter_chunks():
+                if len(pending) >= 2 * self.jobs:
+                    self.output.write(pending.popleft().result())
+                pending.append(pool.submit(render_pages,
+                                           self.visualizer_class,
+                                           self.visualizer_options,
+                                           state, chunk, outputs))
+            while pending:
+                self.output.write(pending.popleft().result())
+
+    def render_page(self, p):
+        execute = self.vis.execute
+        for opcode, arg in p:
+            execute(opcode, arg)
+        self.vis.new_page()
 
     def close(self):
         self.vis.close()
+        if self.profiler is not None:
+            self.profiler.stop()
@@ -10,9 +10,12 @@
 Main classes for T++
 """
 
-import urwid
-import re
-import subprocess
+import os
+import sys
+import pickle
+import hashlib
+from array import array
+from itertools import accumulate
 
 
 class TplusplusException(Exception):
@@ -33,16 +36,282 @@ def abstract_method(fn):
     return abstracted
 
 
+# Opcodes of the compiled form of a page which do not correspond to a
+# directive word: plain text lines, and the '---' pause.
+TEXT = 'text'
+WAIT = 'wait'
+
+# Items which FileParser handles itself and never end up in a page
+NEWPAGE = 'newpage'
+INCLUDE = 'include'
+
+# Maps every directive word (the token following '--' at the beginning of a
+# line) to the name of its handler, and whether it takes an argument, in which
+# case the word has to be followed by a space.
+DIRECTIVES = {
+    'heading': ('do_heading', True),
+    'withborder': ('do_withborder', False),
+    'horline': ('do_horline', False),
+    'color': ('do_color', True),
+    'center': ('do_center', True),
+    'right': ('do_right', True),
+    'exec': ('do_exec', True),
+    'beginoutput': ('do_beginoutput', False),
+    'beginshelloutput': ('do_beginshelloutput', False),
+    'endoutput': ('do_endoutput', False),
+    'endshelloutput': ('do_endshelloutput', False),
+    'sleep': ('do_sleep', True),
+    'boldon': ('do_boldon', False),
+    'boldoff': ('do_boldoff', False),
+    'revon': ('do_revon', False),
+    'revoff': ('do_revoff', False),
+    'ulon': ('do_ulon', False),
+    'uloff': ('do_uloff', False),
+    'beginslideleft': ('do_beginslideleft', False),
+    'endslide': ('do_endslide', False),
+    'beginslideright': ('do_beginslideright', False),
+    'beginslidetop': ('do_beginslidetop', False),
+    'beginslidebottom': ('do_beginslidebottom', False),
+    'sethugefont': ('do_sethugefont', True),
+    'huge': ('do_huge', True),
+    'footer': ('set_footer', True),
+    'header': ('set_header', True),
+    'title': ('do_title', True),
+    'author': ('do_author', True),
+    'date': ('set_date', True),
+    'bgcolor': ('do_bgcolor', True),
+    'fgcolor': ('do_fgcolor', True),
+}
+
+
+# Opcodes in the order of their codes in compact pages. Decoded opcodes are
+# always these interned strings, whatever string the parser built.
+OPCODES = tuple(sys.intern(opcode) for opcode in (TEXT, WAIT) +
+                tuple(DIRECTIVES))
+OPCODE_CODES = {opcode: code for code, opcode in enumerate(OPCODES)}
+# whether the ops of each code have an argument (TEXT does, WAIT does not)
+OPCODE_ARGS = (True, False) + tuple(needs_arg for name, needs_arg
+                                    in DIRECTIVES.values())
+
+
+def compile_line(line):
+    """Translates a source line into an (opcode, argument) tuple. The opcode
+    is either a directive word, TEXT or WAIT. Directives without argument get
+    None as argument.
+    """
+    if not line.startswith('--'):
+        return (TEXT, line)
+    if line.startswith('---'):
+        return (WAIT, None)
+
+    end = line.find(' ', 2)
+    word = line[2:end] if end >= 0 else line[2:]
+    entry = DIRECTIVES.get(word)
+    if entry is None:
+        return (TEXT, line)
+    if not entry[1]:
+        return (word, None)
+    if end < 0:
+        # the directive is incomplete, show it as it is
+        return (TEXT, line)
+    return (word, line[end:].strip())
+
+
+def parse_line(line):
+    """Translates a source line into an item of FileParser: a compiled
+    (opcode, argument) tuple, a (NEWPAGE, name) or (INCLUDE, path) tuple, or
+    None for comments.
+    """
+    if line.startswith('--##'):
+        return None  # ignore comments
+    if line.startswith('--newpage'):
+        return (NEWPAGE, line[9:].strip())
+    if line.startswith('--include '):
+        return (INCLUDE, line[10:].strip())
+    return compile_line(line)
+
+
+class IncludeCache:
+    """Keeps the parsed items of included files. An entry is reused while the
+    file keeps its mtime and size, or when its content still has the same
+    hash. Parsed items can also be kept in a directory, keyed by that hash,
+    so that unchanged files are not parsed again in later runs.
+    """
+
+    # changes whenever the format of the parsed items does
+    VERSION = 1
+
+    def __init__(self, directory=None):
+        self.directory = directory
+        self.entries = {}
+
+    def hash(self, path):
+        """Returns the (stat, digest, data) of the file _path_, where _data_ is
+        None if the file did not change since it was last read.
+        """
+        st = os.stat(path)
+        stat = (st.st_mtime_ns, st.st_size)
+        entry = self.entries.get(path)
+        if entry is not None and entry[0] == stat:
+            return stat, entry[1], None
+        with open(path, 'rb') as f:
+            data = f.read()
+        return stat, hashlib.sha256(data).hexdigest(), data
+
+    def read(self, path):
+        """Returns the (digest, items) of the file _path_
+        """
+        stat, digest, data = self.hash(path)
+        entry = self.entries.get(path)
+        if entry is not None and entry[1] == digest:
+            items = entry[2]
+        else:
+            items = self.load(digest)
+            if items is None:
+                items = []
+                for line in data.decode('utf-8').splitlines():
+                    item = parse_line(line)
+                    if item is not None:
+                        items.append(item)
+                self.store(digest, items)
+        self.entries[path] = (stat, digest, items)
+        return digest, items
+
+    def digest(self, path):
+        """Returns the digest of the file _path_, or None if it is missing
+        """
+        try:
+            return self.hash(path)[1]
+        except OSError:
+            return None
+
+    def path(self, digest):
+        return os.path.join(self.directory,
+                            '%s.v%s.items' % (digest, self.VERSION))
+
+    def load(self, digest):
+        if self.directory is None:
+            return None
+        try:
+            with open(self.path(digest), 'rb') as f:
+                return pickle.load(f)
+        except Exception:
+            return None
+
+    def store(self, digest, items):
+        if self.directory is None:
+            return
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            tmp = '%s.%s.tmp' % (self.path(digest), os.getpid())
+            with open(tmp, 'wb') as f:
+                pickle.dump(items, f, pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, self.path(digest))
+        except OSError:
+            pass
+
+
+include_cache = IncludeCache()
+
+
 class FileParser:
     """Opens a T++ source file, and splits it into the different pages"""
 
-    def __init__(self, filename):
+    def __init__(self, filename, includes=None):
         self.filename = filename
+        self.includes = includes if includes is not None else include_cache
         self.pages = []
+        # (path, digest) of every file included by the last parse
+        self.dependencies = []
 
-    def get_pages(self):
+    def get_pages(self, cache=None):
         """Parses the specified file and returns an array of Page objects
         """
+        self.pages = list(self.iter_pages(cache))
+        return self.pages
+
+    def iter_pages(self, cache=None):
+        """Yields the Page objects of the specified file one at a time. If a
+        CompileCache is given, the pages are read from it when neither the
+        file nor the files it includes have changed, and stored into it
+        otherwise.
+        """
+        if cache is None:
+            return self.parse_pages()
+        # the same text includes other files from another directory
+        digest = cache.digest(self.filename, self.origin()[0])
+        if digest is None:
+            return self.parse_pages()
+        pages = cache.load(digest, self.check_cached)
+        if pages is None:
+            pages = cache.store(digest, self.parse_pages(),
+                                lambda: self.dependencies)
+        return pages
+
+    def check_cached(self, dependencies):
+        """Checks the included files of a cached parse, which become the
+        dependencies of this parse if they did not change
+        """
+        if not self.unchanged(dependencies):
+            return False
+        self.dependencies = list(dependencies)
+        return True
+
+    def unchanged(self, dependencies):
+        """Returns whether all the included files of _dependencies_ still have
+        the same digest
+        """
+        for path, digest in dependencies:
+            if self.includes.digest(path) != digest:
+                return False
+        return True
+
+    def source_path(self):
+        name = getattr(self.filename, 'name', None)
+        if not isinstance(name, str) or name.startswith('<'):
+            return None
+        return os.path.realpath(name)
+
+    def origin(self):
+        """Returns the directory included files are relative to, and the
+        include stack to start from
+        """
+        path = self.source_path()
+        if path is None:
+            return os.getcwd(), []
+        return os.path.dirname(path), [path]
+
+    def expand(self, items, directory, stack):
+        """Yields _items_, replacing --include items by the items of the
+        included files, whose paths are relative to _directory_. _stack_ holds
+        the files being included, to detect cycles.
+        """
+        for item in items:
+            if item is None:
+                continue
+            if item[0] != INCLUDE:
+                yield item
+                continue
+            path = os.path.realpath(os.path.join(directory, item[1]))
+            if path in stack:
+                raise TplusplusException('Error: include cycle: %s' %
+                                         ' -> '.join(stack + [path]))
+            try:
+                digest, included = self.includes.read(path)
+            except OSError as e:
+                raise TplusplusException('Error: couldn\'t include %s: %s' %
+                                         (item[1], e.strerror))
+            if (path, digest) not in self.dependencies:
+                self.dependencies.append((path, digest))
+            for included_item in self.expand(included, os.path.dirname(path),
+                                             stack + [path]):
+                yield included_item
+
+    def parse_pages(self):
+        """Parses the specified file line by line and yields each Page object
+        as soon as it is complete, so that the whole file never has to be held
+        in memory.
+        """
         # try:
         #     f = open(self.filename, 'r')
         # except:
@@ -50,62 +319,63 @@ class FileParser:
         #     sys.exit(1)
         f = self.filename
         number_pages = 0
+        self.dependencies = []
+        directory, stack = self.origin()
 
-        cur_page = Page('slide %s' % (number_pages + 1))
-        for line in f.readlines():
-            line = line.strip('\n')
-            if re.match('^--##', line):
-                pass  # ignore comments
-            elif re.match('^--newpage', line):
-                self.pages.append(cur_page)
+        items = (parse_line(line.strip('\n')) for line in f)
+        title = 'slide %s' % (number_pages + 1)
+        ops = []
+        for item in self.expand(items, directory, stack):
+            if item[0] == NEWPAGE:
+                yield Page(title, ops)
                 number_pages += 1
-                name = re.search('^--newpage(.*)', line).group(1).strip()
-                if name == '':
-                    name = 'slide %s' % (number_pages + 1)
-                cur_page = Page(name)
+                title = item[1]
+                if title == '':
+                    title = 'slide %s' % (number_pages + 1)
+                ops = []
             else:
-                cur_page.add_line(line)
-        if not len(cur_page.lines):
-            self.pages.append(cur_page)
-        return self.pages
+                ops.append(item)
+        if ops:
+            yield Page(title, ops)
 
 
 class Page:
     """Represents a page (aka 'slide') in T++. A page consists of a title and
-    one or more lines.
+    one or more lines, which are kept in their compiled form. Ops are packed:
+    one byte of opcode each, and the arguments of all the ops in a single
+    string, delimited by an array of offsets. Pages are read through
+    iteration, so that a page can be read by several consumers at once.
     """
 
-    def __init__(self, title):
-        self.lines = []
+    __slots__ = ('title', 'codes', 'text', 'offsets')
+
+    def __init__(self, title, ops=()):
+        codes = OPCODE_CODES
         self.title = title
-        self.cur_line = 0
-        self.eop = False
+        self.codes = bytes([codes[opcode] for opcode, arg in ops])
+        args = [arg or '' for opcode, arg in ops]
+        self.text = ''.join(args)
+        self.offsets = array('I', accumulate(map(len, args), initial=0))
 
-    def add_line(self, line):
-        """Appends a line to the page, but only if _line_ is not null
-        """
-        # if line:
-        self.lines.append(line)
+    def __len__(self):
+        return len(self.codes)
 
-    def next_line(self):
-        """Returns the next line. In case the last line is hit, then the
-        end-of-page marker is set.
-        """
-        # print('%s : %s (%s)' % (self.title, self.cur_line, len(self.lines)))
-        line = self.lines[self.cur_line]
-        self.cur_line += 1
-        if self.cur_line >= len(self.lines):
-            self.eop = True
-        return line
-
-    def reset_eop(self):
-        """Resets the end-of-page marker and sets the current line marker to the
-        first line
+    def __iter__(self):
+        """Yields the (opcode, argument) tuples of the page
         """
-        self.cur_line = 0
-        self.eop = False
-
+        text = self.text
+        offsets = self.offsets
+        for i, code in enumerate(self.codes):
+            if OPCODE_ARGS[code]:
+                yield OPCODES[code], text[offsets[i]:offsets[i + 1]]
+            else:
+                yield OPCODES[code], None
 
+    @property
+    def ops(self):
+        """The list of the (opcode, argument) tuples of the page
+        """
+        return list(self)
 
 
 class TppController:
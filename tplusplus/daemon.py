@@ -0,0 +1,211 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Copyright © 2014 Damien Nicolas <damien@gordon.re>
+#
+# Distributed under terms of the MIT license.
+
+"""
+Long-running render daemon for T++, and the client which sends it conversion
+jobs over a Unix socket. The client side only needs the standard library, so
+that it starts as fast as possible.
+
+Each job is a JSON line sent by the client. The daemon answers with messages
+made of a '<kind> <length>' line followed by _length_ bytes, where _kind_ is
+'data' (a chunk of the output), 'error' or 'done'.
+"""
+
+import os
+import json
+import stat
+import socket
+import tempfile
+
+
+def default_socket_path():
+    directory = os.environ.get('XDG_RUNTIME_DIR')
+    if directory:
+        return os.path.join(directory, 'tplusplus.sock')
+    # the shared temporary directory gets a private directory per user
+    return os.path.join(tempfile.gettempdir(), 'tplusplus-%s' % os.getuid(),
+                        'daemon.sock')
+
+
+def check_owner(path):
+    """Raises an OSError if _path_ belongs to another user
+    """
+    if os.stat(path).st_uid != os.getuid():
+        raise OSError('%s belongs to another user' % path)
+
+
+def send_message(f, kind, payload=b''):
+    f.write(('%s %s\n' % (kind, len(payload))).encode('ascii') + payload)
+    f.flush()
+
+
+def read_message(f):
+    header = f.readline()
+    if not header:
+        return None, b''
+    kind, length = header.decode('ascii').split()
+    return kind, f.read(int(length))
+
+
+class MessageWriter:
+    """File-like object sending everything written to it as data messages"""
+
+    def __init__(self, f):
+        self.f = f
+
+    def write(self, text):
+        send_message(self.f, 'data', text.encode('utf-8'))
+
+    def close(self):
+        pass
+
+
+def convert(socket_path, input, output, options=None, exec_settings=None):
+    """Asks the daemon listening on _socket_path_ to convert the file
+    _input_ to text, and writes the result to the file object _output_.
+    --exec commands run in the current directory, with an ExecCache created
+    from _exec_settings_. Raises an OSError if the daemon can't be reached,
+    and a RuntimeError if the conversion failed.
+    """
+    job = {'input': os.path.abspath(input), 'options': options or {},
+           'cwd': os.getcwd(), 'exec': exec_settings}
+    # another user's daemon would read our files and run our commands
+    check_owner(socket_path)
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(socket_path)
+        f = sock.makefile('rwb')
+        f.write(json.dumps(job).encode('utf-8') + b'\n')
+        f.flush()
+        while True:
+            kind, payload = read_message(f)
+            if kind == 'data':
+                output.write(payload.decode('utf-8'))
+            elif kind == 'done':
+                return
+            elif kind == 'error':
+                raise RuntimeError(payload.decode('utf-8'))
+            else:
+                raise RuntimeError('Error: the daemon closed the connection')
+    finally:
+        sock.close()
+
+
+class DeckCache:
+    """Keeps the parsed pages of the last _size_ decks converted by the
+    daemon, until their file, or a file they include, changes.
+    """
+
+    def __init__(self, cache=None, size=16):
+        import threading
+        from collections import OrderedDict
+        self.cache = cache
+        self.size = size
+        self.decks = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, path):
+        from tplusplus.core import FileParser
+        st = os.stat(path)
+        signature = (st.st_mtime_ns, st.st_size)
+        with self.lock:
+            entry = self.decks.get(path)
+            if entry is not None:
+                self.decks.move_to_end(path)
+        if entry is not None and entry[0] == signature:
+            parser = FileParser(None)
+            if parser.unchanged(entry[1]):
+                return entry[2]
+        with open(path, 'rt') as f:
+            parser = FileParser(f)
+            pages = parser.get_pages(self.cache)
+        with self.lock:
+            self.decks[path] = (signature, parser.dependencies, pages)
+            self.decks.move_to_end(path)
+            while len(self.decks) > self.size:
+                self.decks.popitem(last=False)
+        return pages
+
+
+def remove_stale_socket(socket_path):
+    """Prepares _socket_path_ for a new daemon: creates its directory if
+    needed, private to the user, and removes the socket of a daemon which
+    is not running anymore. Raises a RuntimeError if a daemon answers on
+    the socket, or if the path is not a socket.
+    """
+    directory = os.path.dirname(os.path.abspath(socket_path))
+    if not os.path.isdir(directory):
+        os.makedirs(directory, mode=0o700)
+    try:
+        st = os.lstat(socket_path)
+    except FileNotFoundError:
+        return
+    if not stat.S_ISSOCK(st.st_mode):
+        raise RuntimeError('Error: %s exists and is not a socket'
+                           % socket_path)
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(socket_path)
+    except ConnectionRefusedError:
+        os.unlink(socket_path)
+        return
+    finally:
+        sock.close()
+    raise RuntimeError('Error: a daemon is already listening on %s'
+                       % socket_path)
+
+
+def serve(socket_path, cache=None):
+    """Listens on _socket_path_ and converts decks until interrupted. Parsed
+    decks, figlet renderings and wrapped lines stay in memory between jobs.
+    """
+    import socketserver
+    from tplusplus.controllers import ConversionController
+    from tplusplus.execcache import ExecCache
+    from tplusplus.visualizers.textvisualizer import TextVisualizer
+
+    decks = DeckCache(cache)
+
+    class JobHandler(socketserver.StreamRequestHandler):
+
+        def handle(self):
+            try:
+                job = json.loads(self.rfile.readline().decode('utf-8'))
+                pages = decks.get(job['input'])
+                options = dict(job['options'], exec_cwd=job.get('cwd'))
+                if job.get('exec') is not None:
+                    # outputs only outlive the job in the cache directory,
+                    # where they expire
+                    options['exec_cache'] = ExecCache(**job['exec'])
+                ctrl = ConversionController(None,
+                                            MessageWriter(self.wfile),
+                                            TextVisualizer,
+                                            visualizer_options=options,
+                                            pages=pages)
+                ctrl.run()
+                ctrl.close()
+            except Exception as e:
+                send_message(self.wfile, 'error', str(e).encode('utf-8'))
+            else:
+                send_message(self.wfile, 'done')
+
+    remove_stale_socket(socket_path)
+    # the socket is only accessible to its owner from its creation on
+    umask = os.umask(0o177)
+    try:
+        server = socketserver.ThreadingUnixStreamServer(socket_path,
+                                                        JobHandler)
+    finally:
+        os.umask(umask)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        os.unlink(socket_path)
@@ -0,0 +1,234 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Copyright © 2014 Damien Nicolas <damien@gordon.re>
+#
+# Distributed under terms of the MIT license.
+
+"""
+Cached --exec results, so that exports can show command output without
+running every command each time
+"""
+
+import os
+import time
+import signal
+import hashlib
+import subprocess
+from time import perf_counter
+from tplusplus import profiler
+
+
+def file_digest(path):
+    """Returns the hexadecimal SHA-256 digest of the file _path_, or None if
+    it can't be read
+    """
+    h = hashlib.sha256()
+    try:
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(65536), b''):
+                h.update(chunk)
+    except OSError:
+        return None
+    return h.hexdigest()
+
+
+def run_command(cmdline, timeout=None, cwd=None, env=None):
+    """Runs _cmdline_ in a shell, in the directory _cwd_ and with the
+    environment _env_, and returns (output, complete), where _complete_ is
+    False if the command was stopped after _timeout_ seconds
+    """
+    start = perf_counter()
+    try:
+        proc = subprocess.Popen(cmdline,
+                                shell=True,
+                                stdin=subprocess.DEVNULL,
+                                stdout=subprocess.PIPE,
+                                stderr=subprocess.STDOUT,
+                                cwd=cwd,
+                                env=env,
+                                start_new_session=True)
+    except OSError as e:
+        return '%s\n' % e, True
+    try:
+        output, complete = proc.communicate(timeout=timeout)[0], True
+    except subprocess.TimeoutExpired:
+        output, complete = stop_command(proc), False
+    profiler.record_subprocess('exec', cmdline, perf_counter() - start)
+    output = output.decode('utf-8', 'replace')
+    if not complete:
+        if output and not output.endswith('\n'):
+            output += '\n'
+        output += '[timed out after %gs]\n' % timeout
+    return output, complete
+
+
+def stop_command(proc, grace=1):
+    """Terminates the process group of _proc_, killing it if it is still
+    running after _grace_ seconds, and returns the output read so far
+    """
+    for sig in (signal.SIGTERM, signal.SIGKILL):
+        try:
+            os.killpg(proc.pid, sig)
+        except OSError:
+            pass
+        try:
+            return proc.communicate(timeout=grace)[0]
+        except subprocess.TimeoutExpired:
+            pass
+    # a child holding the pipe open outside of the group
+    proc.stdout.close()
+    proc.wait()
+    return b''
+
+
+class ExecCache:
+    """Keeps the output of --exec commands, keyed by the hash of the command
+    line, the working directory, and the content of the declared input
+    files and environment variables. Commands run with _environ_, or the
+    environment of the process if it is None. Outputs are kept in memory, and
+    optionally in a directory, and expire after _ttl_ seconds. The least
+    recently used ones of the directory are dropped beyond _max_size_ bytes.
+    Commands which time out are not cached, and refresh runs every command
+    again, once per ExecCache.
+    """
+
+    def __init__(self, directory=None, ttl=None, max_size=64 * 1024 * 1024,
+                 timeout=60, dependencies=(), environment=(), refresh=False,
+                 environ=None):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_size = max_size
+        self.timeout = timeout
+        self.dependencies = list(dependencies)
+        self.environment = list(environment)
+        self.refresh = refresh
+        self.environ = environ
+        self.entries = {}
+
+    def settings(self):
+        """Returns the arguments to create an ExecCache configured alike,
+        e.g. in another process
+        """
+        return {'directory': self.directory, 'ttl': self.ttl,
+                'max_size': self.max_size, 'timeout': self.timeout,
+                'dependencies': self.dependencies,
+                'environment': self.environment, 'refresh': self.refresh,
+                'environ': self.environ}
+
+    def key(self, cmdline, cwd):
+        environ = os.environ if self.environ is None else self.environ
+        inputs = (cmdline, cwd,
+                  [(path, file_digest(path)) for path in self.dependencies],
+                  [(name, environ.get(name)) for name in self.environment])
+        content = repr(inputs).encode('utf-8', 'surrogateescape')
+        return hashlib.sha256(content).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key)
+
+    def load(self, key):
+        """Returns the (time stored, output) of the entry _key_ of the
+        directory, or None
+        """
+        if self.directory is None:
+            return None
+        path = self.path(key)
+        try:
+            stored = os.stat(path).st_mtime
+            if self.ttl is not None and time.time() - stored > self.ttl:
+                os.unlink(path)
+                return None
+            with open(path, 'r', encoding='utf-8') as f:
+                output = f.read()
+            # the access time orders the entries for eviction
+            os.utime(path, (time.time(), stored))
+        except OSError:
+            return None
+        return stored, output
+
+    def store(self, key, output):
+        if self.directory is None:
+            return
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            tmp = '%s.%s.tmp' % (self.path(key), os.getpid())
+            with open(tmp, 'w', encoding='utf-8') as f:
+                f.write(output)
+            os.replace(tmp, self.path(key))
+            self.evict()
+        except OSError:
+            pass
+
+    def evict(self):
+        """Removes the expired entries of the directory, then the least
+        recently used ones until the directory holds at most max_size bytes
+        """
+        now = time.time()
+        entries = []
+        total = 0
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.tmp'):
+                continue
+            try:
+                st = entry.stat()
+            except OSError:
+                continue
+            if self.ttl is not None and now - st.st_mtime > self.ttl:
+                self.remove(entry.path)
+                continue
+            entries.append((st.st_atime, st.st_size, entry.path))
+            total += st.st_size
+        entries.sort()
+        for atime, size, path in entries:
+            if total <= self.max_size:
+                break
+            self.remove(path)
+            total -= size
+
+    def remove(self, path):
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+    def run(self, cmdline, cwd=None):
+        """Returns the output of _cmdline_ run in _cwd_ (the current
+        directory by default), running it only if it is not cached or if
+        refresh is set
+        """
+        cwd = cwd or os.getcwd()
+        key = self.key(cmdline, cwd)
+        entry = self.entries.get(key)
+        if entry is not None and self.ttl is not None and \
+                time.time() - entry[0] > self.ttl:
+            entry = None
+        # with refresh, only the outputs of this run are reused
+        if entry is None and not self.refresh:
+            entry = self.load(key)
+        if entry is None:
+            output, complete = run_command(cmdline, self.timeout, cwd,
+                                           self.environ)
+            if not complete:
+                return output
+            self.store(key, output)
+            entry = (time.time(), output)
+        self.entries[key] = entry
+        return entry[1]
+
+
+exec_cache = ExecCache()
+
+
+def configure(**settings):
+    """Replaces the shared ExecCache by one created with _settings_
+    """
+    global exec_cache
+    exec_cache = ExecCache(**settings)
+
+
+def run_exec(cmdline, cwd=None):
+    """Runs _cmdline_ in _cwd_ through the shared ExecCache
+    """
+    return exec_cache.run(cmdline, cwd)
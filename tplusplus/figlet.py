@@ -0,0 +1,105 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Copyright © 2014 Damien Nicolas <damien@gordon.re>
+#
+# Distributed under terms of the MIT license.
+
+"""
+Cached figlet rendering, shared by all visualizers
+"""
+
+import os
+import hashlib
+import subprocess
+import threading
+from time import perf_counter
+from collections import OrderedDict
+from tplusplus import profiler
+
+
+def run_figlet(text, font, width):
+    """Runs figlet and returns (output, complete), where _complete_ is False
+    if figlet could not be run or failed, e.g. on an unknown font
+    """
+    start = perf_counter()
+    try:
+        op = subprocess.Popen(['figlet', '-C', 'utf8', '-f', font,
+                               '-w', str(width), text],
+                              stdout=subprocess.PIPE)
+    except OSError:
+        return '', False
+    output = op.communicate()[0]
+    profiler.record_subprocess('huge', text, perf_counter() - start)
+    return output.decode(), op.returncode == 0
+
+
+class FigletCache:
+    """Keeps figlet renderings keyed by (font, width, text) in a bounded LRU,
+    and optionally in a persistent directory. Failed renderings are not
+    kept, so that they are retried once figlet or the font is installed.
+    """
+
+    def __init__(self, maxsize=256, directory=None):
+        self.maxsize = maxsize
+        self.directory = directory
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def path(self, key):
+        name = hashlib.sha256(repr(key).encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, name)
+
+    def load(self, key):
+        if self.directory is None:
+            return None
+        try:
+            with open(self.path(key), 'r', encoding='utf-8') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def store(self, key, output):
+        if self.directory is None:
+            return
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            tmp = '%s.%s.tmp' % (self.path(key), os.getpid())
+            with open(tmp, 'w', encoding='utf-8') as f:
+                f.write(output)
+            os.replace(tmp, self.path(key))
+        except OSError:
+            pass
+
+    def render(self, text, font, width):
+        """Returns the figlet rendering of _text_ in _font_ for a terminal of
+        _width_ columns, running figlet only on a cache miss.
+        """
+        key = (font, width, text)
+        with self.lock:
+            output = self.entries.get(key)
+            if output is not None:
+                self.entries.move_to_end(key)
+                return output
+        output = self.load(key)
+        if output is None:
+            output, complete = run_figlet(text, font, width)
+            if not complete:
+                return output
+            self.store(key, output)
+        with self.lock:
+            self.entries[key] = output
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+        return output
+
+
+figlet_cache = FigletCache()
+
+
+def render_figlet(text, font, width):
+    """Renders _text_ through the shared FigletCache
+    """
+    return figlet_cache.render(text, font, width)
@@ -0,0 +1,50 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Copyright © 2014 Damien Nicolas <damien@gordon.re>
+#
+# Distributed under terms of the MIT license.
+
+"""
+Concurrent pre-rendering of the --huge directives of a deck
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from tplusplus.figlet import render_figlet
+
+
+class Prerenderer:
+    """Scans compiled pages for --huge directives and runs figlet on a bounded
+    pool of worker threads. Visualizers then pick the results up in slide
+    order, waiting only for the ones which are not finished yet.
+    """
+
+    def __init__(self, max_workers=None):
+        self.pool = ThreadPoolExecutor(max_workers=max_workers)
+        self.figlets = {}
+
+    def submit(self, pages, figletfont, width):
+        """Starts rendering every --huge directive of _pages_, following
+        --sethugefont from _figletfont_ on.
+        """
+        for page in pages:
+            for opcode, arg in page:
+                if opcode == 'sethugefont':
+                    figletfont = arg
+                elif opcode == 'huge':
+                    key = (arg, figletfont, width)
+                    if key not in self.figlets:
+                        self.figlets[key] = self.pool.submit(render_figlet,
+                                                             *key)
+
+    def huge(self, text, font, width):
+        """Returns the figlet rendering of _text_
+        """
+        future = self.figlets.get((text, font, width))
+        if future is None:
+            return render_figlet(text, font, width)
+        return future.result()
+
+    def shutdown(self):
+        self.pool.shutdown(wait=False)
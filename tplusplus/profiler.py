@@ -0,0 +1,125 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Copyright © 2014 Damien Nicolas <damien@gordon.re>
+#
+# Distributed under terms of the MIT license.
+
+"""
+Per-directive profiling of conversions
+"""
+
+import json
+from time import perf_counter
+
+# the Profiler subprocess timings are reported to, if any
+current = None
+
+
+def record_subprocess(kind, detail, seconds):
+    """Reports that a _kind_ subprocess ('huge' or 'exec') ran for _seconds_
+    to the current Profiler
+    """
+    if current is not None:
+        current.subprocesses.append((kind, detail, seconds))
+
+
+class Profiler:
+    """Records call counts and cumulative time per handler, render time per
+    page and wall time per subprocess.
+    """
+
+    def __init__(self):
+        self.handlers = {}
+        self.pages = []
+        self.subprocesses = []
+
+    def start(self):
+        global current
+        current = self
+
+    def stop(self):
+        global current
+        if current is self:
+            current = None
+
+    def instrument(self, vis):
+        """Replaces the execute() method of the visualizer _vis_ with one
+        which times every handler call, under the name of the visualizer
+        class and of the handler. The visualizers of a FanoutVisualizer are
+        instrumented instead of itself.
+        """
+        children = getattr(vis, 'visualizers', None)
+        if children is not None:
+            for child in children:
+                self.instrument(child)
+            return
+        execute = vis.execute
+        dispatcher = vis.get_dispatcher()
+        handlers = self.handlers
+        prefix = type(vis).__name__
+
+        def timed_execute(opcode, arg):
+            start = perf_counter()
+            wait = execute(opcode, arg)
+            elapsed = perf_counter() - start
+            name = '%s.%s' % (prefix, dispatcher[opcode][0].__name__)
+            stats = handlers.get(name)
+            if stats is None:
+                handlers[name] = [1, elapsed]
+            else:
+                stats[0] += 1
+                stats[1] += elapsed
+            return wait
+        vis.execute = timed_execute
+
+    def record_page(self, title, seconds):
+        self.pages.append((title, seconds))
+
+    def report(self):
+        handlers = [{'handler': name, 'calls': calls, 'seconds': seconds}
+                    for name, (calls, seconds) in self.handlers.items()]
+        handlers.sort(key=lambda h: h['seconds'], reverse=True)
+        return {
+            'handlers': handlers,
+            'pages': [{'page': number, 'title': title, 'seconds': seconds}
+                      for number, (title, seconds)
+                      in enumerate(self.pages, 1)],
+            'subprocesses': [{'kind': kind, 'detail': detail,
+                              'seconds': seconds}
+                             for kind, detail, seconds in self.subprocesses],
+            'total': sum(seconds for title, seconds in self.pages),
+        }
+
+    def write_json(self, f):
+        json.dump(self.report(), f, indent=2)
+        f.write('\n')
+
+    def write_table(self, f, limit=10):
+        report = self.report()
+        f.write('Total render time: %.4fs over %s pages\n\n' %
+                (report['total'], len(report['pages'])))
+        f.write('%-40s %8s %10s %10s\n' % ('handler', 'calls', 'total',
+                                           'per call'))
+        for h in report['handlers']:
+            f.write('%-40s %8s %9.4fs %9.6fs\n' %
+                    (h['handler'], h['calls'], h['seconds'],
+                     h['seconds'] / h['calls']))
+        pages = sorted(report['pages'], key=lambda p: p['seconds'],
+                       reverse=True)[:limit]
+        if pages:
+            f.write('\n%-6s %-40s %10s\n' % ('page', 'slowest pages',
+                                             'time'))
+            for p in pages:
+                f.write('%-6s %-40.40s %9.4fs\n' % (p['page'], p['title'],
+                                                    p['seconds']))
+        subprocesses = sorted(report['subprocesses'],
+                              key=lambda s: s['seconds'],
+                              reverse=True)[:limit]
+        if subprocesses:
+            f.write('\n%-6s %-40s %10s\n' % ('kind', 'slowest subprocesses',
+                                             'time'))
+            for s in subprocesses:
+                f.write('%-6s %-40.40s %9.4fs\n' % (s['kind'], s['detail'],
+                                                    s['seconds']))
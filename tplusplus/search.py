@@ -0,0 +1,87 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Copyright © 2014 Damien Nicolas <damien@gordon.re>
+#
+# Distributed under terms of the MIT license.
+
+"""
+Full-text search across the slides of a deck
+"""
+
+import re
+from bisect import bisect_left
+from tplusplus.core import TEXT
+
+# opcodes whose argument is shown as text on the slide
+TEXT_OPCODES = frozenset((TEXT, 'heading', 'center', 'right', 'huge',
+                          'title', 'author', 'date', 'header', 'footer'))
+
+WORD_RE = re.compile(r'\w+')
+
+
+def words(text):
+    return WORD_RE.findall(text.lower())
+
+
+def page_text(page):
+    """Yields the title of _page_ and the text shown by its ops, without
+    directive syntax
+    """
+    yield page.title
+    for opcode, arg in page:
+        if opcode in TEXT_OPCODES and arg:
+            yield arg
+
+
+class SearchIndex:
+    """Inverted index mapping every word to the numbers of the slides it
+    appears on. The last word of a query also matches as a prefix, so that
+    results can be updated while the query is typed.
+    """
+
+    def __init__(self, pages=()):
+        self.index = {}
+        self.words = None
+        self.pages = 0
+        for page in pages:
+            self.add_page(page)
+
+    def add_page(self, page):
+        number = self.pages
+        self.pages += 1
+        for text in page_text(page):
+            for word in words(text):
+                numbers = self.index.setdefault(word, [])
+                if not numbers or numbers[-1] != number:
+                    numbers.append(number)
+        self.words = None
+
+    def prefixed(self, prefix):
+        """Returns the set of slides containing a word starting with
+        _prefix_
+        """
+        if self.words is None:
+            self.words = sorted(self.index)
+        found = set()
+        i = bisect_left(self.words, prefix)
+        while i < len(self.words) and self.words[i].startswith(prefix):
+            found.update(self.index[self.words[i]])
+            i += 1
+        return found
+
+    def search(self, query):
+        """Returns the sorted numbers (starting at 0) of the slides matching
+        all the words of _query_
+        """
+        terms = words(query)
+        if not terms:
+            return []
+        found = None
+        for term in terms[:-1]:
+            numbers = set(self.index.get(term, ()))
+            found = numbers if found is None else found & numbers
+        last = self.prefixed(terms[-1])
+        found = last if found is None else found & last
+        return sorted(found)
@@ -7,8 +7,90 @@
 # Distributed under terms of the MIT license.
 
 """
-Automatically imports all visualizers
+Registry of the visualizers, which are only imported when selected, so that a
+text conversion does not pay for loading urwid.
+
+Other packages can add visualizers by calling register(), or by declaring an
+entry point in the 'tplusplus.visualizers' group, e.g.:
+
+    [project.entry-points.'tplusplus.visualizers']
+    html = 'tplusplus_html:HtmlVisualizer'
 """
 
-from .textvisualizer import TextVisualizer
-from .ncursesvisualizer import NcursesVisualizer
+from importlib import import_module
+
+ENTRY_POINT_GROUP = 'tplusplus.visualizers'
+
+# name -> visualizer class, or 'module:Class' string until it is loaded
+registry = {
+    'text': 'tplusplus.visualizers.textvisualizer:TextVisualizer',
+    'ncurses': 'tplusplus.visualizers.ncursesvisualizer:NcursesVisualizer',
+    'markdown': 'tplusplus.visualizers.markdownvisualizer:MarkdownVisualizer',
+    'html': 'tplusplus.visualizers.htmlvisualizer:HtmlVisualizer',
+    'ansi': 'tplusplus.visualizers.ansivisualizer:AnsiVisualizer',
+    'terminal': 'tplusplus.visualizers.terminalvisualizer:TerminalVisualizer',
+}
+
+# output types which write a file, and take the flush_threshold option
+EXPORT_TYPES = ('text', 'markdown', 'html', 'ansi')
+
+# attributes kept for 'from tplusplus.visualizers import TextVisualizer'
+aliases = {
+    'TextVisualizer': 'text',
+    'NcursesVisualizer': 'ncurses',
+}
+
+entry_points_loaded = False
+
+
+def register(name, visualizer):
+    """Registers _visualizer_ as the -t _name_ output type. _visualizer_ is
+    either a TppVisualizer subclass, or a 'module:Class' string which is only
+    imported when the visualizer is used.
+    """
+    registry[name] = visualizer
+
+
+def load_entry_points():
+    global entry_points_loaded
+    if entry_points_loaded:
+        return
+    entry_points_loaded = True
+    try:
+        from importlib.metadata import entry_points
+    except ImportError:
+        return
+    try:
+        found = entry_points(group=ENTRY_POINT_GROUP)
+    except TypeError:
+        # Python < 3.10
+        found = entry_points().get(ENTRY_POINT_GROUP, ())
+    for entry_point in found:
+        registry.setdefault(entry_point.name, entry_point.value)
+
+
+def names():
+    """Returns the sorted names of all the available visualizers
+    """
+    load_entry_points()
+    return sorted(registry)
+
+
+def get(name):
+    """Returns the visualizer class registered as _name_, importing it if
+    needed. Raises a KeyError if there is no such visualizer.
+    """
+    if name not in registry:
+        load_entry_points()
+    visualizer = registry[name]
+    if isinstance(visualizer, str):
+        module, _, attr = visualizer.partition(':')
+        visualizer = getattr(import_module(module), attr)
+        registry[name] = visualizer
+    return visualizer
+
+
+def __getattr__(attr):
+    if attr in aliases:
+        return get(aliases[attr])
+    raise AttributeError("module %r has no attribute %r" % (__name__, attr))
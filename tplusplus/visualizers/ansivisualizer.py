@@ -0,0 +1,101 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Copyright © 2014 gordon <gordon@starswirl>
+#
+# Distributed under terms of the MIT license.
+
+"""
+ANSI visualizer for T++: text output with terminal escape sequences
+"""
+
+# first we need to set the sys.path to the project's root folder
+import sys
+sys.path.append('../..')
+
+from tplusplus.visualizers.textvisualizer import TextVisualizer
+
+COLORS = ('black', 'red', 'green', 'yellow', 'blue', 'magenta', 'cyan',
+          'white')
+
+
+class AnsiVisualizer(TextVisualizer):
+    """Implements a visualizer which converts T++ source to text with ANSI
+    escape sequences for bold, underlined and reverse text and colors, e.g.
+    to be shown with 'less -R'
+    """
+
+    STATE_ATTRS = TextVisualizer.STATE_ATTRS + ('bold', 'ul', 'rev', 'fg',
+                                                'bg')
+
+    STATE_OPCODES = TextVisualizer.STATE_OPCODES | frozenset(('boldon',
+                                                              'boldoff',
+                                                              'ulon',
+                                                              'uloff',
+                                                              'revon',
+                                                              'revoff',
+                                                              'fgcolor',
+                                                              'bgcolor'))
+
+    def __init__(self, outputfile, flush_threshold=65536, exec_cache=None,
+                 exec_cwd=None):
+        TextVisualizer.__init__(self, outputfile, flush_threshold, exec_cache,
+                                exec_cwd)
+        self.bold = False
+        self.ul = False
+        self.rev = False
+        self.fg = None
+        self.bg = None
+
+    def sgr(self):
+        """Returns the escape sequence selecting the current attributes
+        """
+        codes = []
+        if self.bold:
+            codes.append('1')
+        if self.ul:
+            codes.append('4')
+        if self.rev:
+            codes.append('7')
+        if self.fg is not None:
+            codes.append(str(30 + self.fg))
+        if self.bg is not None:
+            codes.append(str(40 + self.bg))
+        return '\033[%sm' % ';'.join(codes) if codes else ''
+
+    def write_line(self, line):
+        sgr = self.sgr()
+        if sgr:
+            line = '%s%s\033[0m' % (sgr, line)
+        TextVisualizer.write_line(self, line)
+
+    def do_heading(self, text):
+        self.write('\n')
+        for l in self.split_lines(text, self.width):
+            self.write('\033[1;4m%s\033[0m\n' % l)
+        self.write('\n')
+
+    def do_boldon(self):
+        self.bold = True
+
+    def do_boldoff(self):
+        self.bold = False
+
+    def do_revon(self):
+        self.rev = True
+
+    def do_revoff(self):
+        self.rev = False
+
+    def do_ulon(self):
+        self.ul = True
+
+    def do_uloff(self):
+        self.ul = False
+
+    def do_fgcolor(self, color):
+        self.fg = COLORS.index(color) if color in COLORS else None
+
+    def do_bgcolor(self, color):
+        self.bg = COLORS.index(color) if color in COLORS else None
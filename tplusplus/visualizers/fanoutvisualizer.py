@@ -0,0 +1,50 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Copyright © 2014 gordon <gordon@starswirl>
+#
+# Distributed under terms of the MIT license.
+
+"""
+Fan-out visualizer for T++, which converts a deck to several formats at once
+"""
+
+# first we need to set the sys.path to the project's root folder
+import sys
+sys.path.append('../..')
+
+from tplusplus.visualizers.tppvisualizer import TppVisualizer
+
+
+class FanoutVisualizer(TppVisualizer):
+    """Forwards every op to several visualizers, so that a deck is parsed and
+    dispatched once for all of its outputs. --huge and --exec results are
+    shared through the figlet and exec caches.
+    """
+
+    def __init__(self, outputs):
+        """_outputs_ is a list of (visualizer class, output file, options)
+        tuples
+        """
+        self.visualizers = [visualizer_class(output, **(options or {}))
+                            for visualizer_class, output, options in outputs]
+
+    def prepare(self, pages):
+        for vis in self.visualizers:
+            pages = vis.prepare(pages)
+        return pages
+
+    def execute(self, opcode, arg):
+        wait = False
+        for vis in self.visualizers:
+            wait = vis.execute(opcode, arg) or wait
+        return wait
+
+    def new_page(self):
+        for vis in self.visualizers:
+            vis.new_page()
+
+    def close(self):
+        for vis in self.visualizers:
+            vis.close()
@@ -0,0 +1,159 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Copyright © 2014 gordon <gordon@starswirl>
+#
+# Distributed under terms of the MIT license.
+
+"""
+HTML visualizer for T++
+"""
+
+# first we need to set the sys.path to the project's root folder
+import sys
+sys.path.append('../..')
+
+from html import escape
+from tplusplus.figlet import render_figlet
+from tplusplus.visualizers.textvisualizer import TextVisualizer
+
+
+class HtmlVisualizer(TextVisualizer):
+    """Implements a visualizer which converts T++ source to a standalone HTML
+    document, with a <section> per slide
+    """
+
+    STATE_ATTRS = TextVisualizer.STATE_ATTRS + ('bold', 'ul', 'rev')
+
+    STATE_OPCODES = TextVisualizer.STATE_OPCODES | frozenset(('boldon',
+                                                              'boldoff',
+                                                              'ulon',
+                                                              'uloff',
+                                                              'revon',
+                                                              'revoff'))
+
+    # the document head and end are written by every instance
+    PARALLEL_PAGES = False
+
+    head = ('<!DOCTYPE html>\n'
+            '<html>\n'
+            '<head>\n'
+            '<meta charset="utf-8">\n'
+            '<title>T++</title>\n'
+            '<style>\n'
+            'section { font-family: monospace; '
+            'border-bottom: 1px solid #888; padding: 1em 0; }\n'
+            'section div { white-space: pre-wrap; min-height: 1em; }\n'
+            '.center { text-align: center; }\n'
+            '.right { text-align: right; }\n'
+            '.rev { color: white; background: black; }\n'
+            '</style>\n'
+            '</head>\n'
+            '<body>\n')
+
+    def __init__(self, outputfile, flush_threshold=65536, exec_cache=None,
+                 exec_cwd=None):
+        TextVisualizer.__init__(self, outputfile, flush_threshold, exec_cache,
+                                exec_cwd)
+        self.bold = False
+        self.ul = False
+        self.rev = False
+        self.in_page = False
+        TextVisualizer.write(self, self.head)
+
+    def write(self, text):
+        if not self.in_page:
+            TextVisualizer.write(self, '<section>\n')
+            self.in_page = True
+        TextVisualizer.write(self, text)
+
+    def new_page(self):
+        if self.in_page:
+            TextVisualizer.write(self, '</section>\n')
+            self.in_page = False
+        if self.buffered >= self.flush_threshold:
+            self.flush()
+
+    def markup(self, text):
+        if self.rev:
+            text = '<span class="rev">%s</span>' % text
+        if self.ul:
+            text = '<u>%s</u>' % text
+        if self.bold:
+            text = '<b>%s</b>' % text
+        return text
+
+    def do_heading(self, text):
+        self.write('<h2>%s</h2>\n' % escape(text))
+
+    def do_horline(self):
+        self.write('<hr>\n')
+
+    def do_beginoutput(self):
+        self.write('<pre>\n')
+        self.output_env = True
+
+    def do_endoutput(self):
+        if self.output_env:
+            self.write('</pre>\n')
+            self.output_env = False
+
+    def do_boldon(self):
+        self.bold = True
+
+    def do_boldoff(self):
+        self.bold = False
+
+    def do_revon(self):
+        self.rev = True
+
+    def do_revoff(self):
+        self.rev = False
+
+    def do_ulon(self):
+        self.ul = True
+
+    def do_uloff(self):
+        self.ul = False
+
+    def do_huge(self, text):
+        output = render_figlet(text, self.figletfont, self.width)
+        if not self.output_env:
+            self.write('<pre>\n')
+        for line in output.split('\n'):
+            self.write('%s\n' % escape(line))
+        if not self.output_env:
+            self.write('</pre>\n')
+
+    def print_line(self, line):
+        self.write_line(line)
+
+    def write_line(self, line, css_class=None):
+        if self.output_env:
+            self.write('%s\n' % escape(line))
+        elif css_class:
+            self.write('<div class="%s">%s</div>\n' %
+                       (css_class, self.markup(escape(line))))
+        else:
+            self.write('<div>%s</div>\n' % self.markup(escape(line)))
+
+    def do_center(self, text):
+        self.write_line(text, 'center')
+
+    def do_right(self, text):
+        self.write_line(text, 'right')
+
+    def do_title(self, title):
+        self.write('<h1>%s</h1>\n' % escape(title))
+
+    def do_author(self, author):
+        self.write('<p class="center">%s</p>\n' % escape(author))
+
+    def do_date(self, date):
+        self.write('<p class="center">%s</p>\n' % escape(date))
+
+    def close(self):
+        self.new_page()
+        TextVisualizer.write(self, '</body>\n</html>\n')
+        TextVisualizer.close(self)
@@ -0,0 +1,123 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Copyright © 2014 gordon <gordon@starswirl>
+#
+# Distributed under terms of the MIT license.
+
+"""
+Markdown visualizer for T++
+"""
+
+# first we need to set the sys.path to the project's root folder
+import sys
+sys.path.append('../..')
+
+import re
+from tplusplus.figlet import render_figlet
+from tplusplus.visualizers.textvisualizer import TextVisualizer
+
+# characters with a meaning anywhere in a line, and the markers which start
+# a block (quote, list, heading underline, numbered list) at its beginning
+SPECIAL = re.compile(r'([\\`*_\[\]<>#|~&])')
+BLOCK = re.compile(r'^(\s*(?:\d+(?=[.)]))?)([>+=.)-])')
+
+
+def escape(text):
+    """Returns _text_ with its Markdown markup escaped, so that it is shown
+    as is
+    """
+    return BLOCK.sub(r'\1\\\2', SPECIAL.sub(r'\\\1', text))
+
+
+class MarkdownVisualizer(TextVisualizer):
+    """Implements a visualizer which converts T++ source to Markdown, one
+    section per slide. Lines are not wrapped, as Markdown renderers do it.
+    """
+
+    STATE_ATTRS = TextVisualizer.STATE_ATTRS + ('bold', 'ul')
+
+    STATE_OPCODES = TextVisualizer.STATE_OPCODES | frozenset(('boldon',
+                                                              'boldoff',
+                                                              'ulon',
+                                                              'uloff'))
+
+    def __init__(self, outputfile, flush_threshold=65536, exec_cache=None,
+                 exec_cwd=None):
+        TextVisualizer.__init__(self, outputfile, flush_threshold, exec_cache,
+                                exec_cwd)
+        self.bold = False
+        self.ul = False
+
+    def new_page(self):
+        self.write('\n---\n\n')
+        if self.buffered >= self.flush_threshold:
+            self.flush()
+
+    def do_heading(self, text):
+        self.write('## %s\n\n' % escape(text))
+
+    def do_horline(self):
+        self.write('\n***\n\n')
+
+    def do_beginoutput(self):
+        self.write('```\n')
+        self.output_env = True
+
+    def do_endoutput(self):
+        if self.output_env:
+            self.write('```\n')
+            self.output_env = False
+
+    def do_boldon(self):
+        self.bold = True
+
+    def do_boldoff(self):
+        self.bold = False
+
+    def do_ulon(self):
+        self.ul = True
+
+    def do_uloff(self):
+        self.ul = False
+
+    def do_huge(self, text):
+        output = render_figlet(text, self.figletfont, self.width)
+        if not self.output_env:
+            self.write('```\n')
+        for line in output.split('\n'):
+            self.write('%s\n' % line)
+        if not self.output_env:
+            self.write('```\n')
+
+    def print_line(self, line):
+        self.write_line(line)
+
+    def write_line(self, line):
+        if self.output_env:
+            self.write('%s\n' % line)
+            return
+        if line.strip():
+            line = escape(line)
+            if self.ul:
+                line = '_%s_' % line
+            if self.bold:
+                line = '**%s**' % line
+        # two trailing spaces keep the line breaks of the slide
+        self.write('%s  \n' % line)
+
+    def do_center(self, text):
+        self.write_line(text)
+
+    def do_right(self, text):
+        self.write_line(text)
+
+    def do_title(self, title):
+        self.write('# %s\n\n' % escape(title))
+
+    def do_author(self, author):
+        self.write('_%s_  \n' % escape(author))
+
+    def do_date(self, date):
+        self.write('_%s_  \n' % escape(date))
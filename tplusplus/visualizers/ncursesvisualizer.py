@@ -14,52 +14,627 @@ NCurses visualizer for T++ (based on Urwid)
 import sys
 sys.path.append('../..')
 
+import os
+import codecs
+import hashlib
+import signal
 import subprocess
 import urwid
+from time import monotonic
+from collections import OrderedDict
+from tplusplus import profiler
+from tplusplus.core import Page
+from tplusplus.prerender import Prerenderer
+from tplusplus.search import SearchIndex
 from tplusplus.visualizers.tppvisualizer import TppVisualizer
 
 
+class LiveCommand:
+    """Runs an --exec command inside the urwid event loop, and appends its
+    output to a Pile as it arrives.
+    """
+
+    # seconds between SIGTERM and SIGKILL when the command is cancelled
+    kill_delay = 1
+
+    def __init__(self, cmdline, timeout):
+        self.cmdline = cmdline
+        self.timeout = timeout
+        # an empty Pile has no rows, so keep a blank line until some output
+        # arrives
+        self.placeholder = urwid.Text('')
+        self.pile = urwid.Pile([self.placeholder])
+        self.proc = None
+        self.handle = None
+        self.alarm = None
+        self.kill_at = None
+        self.pending = ''
+        self.decoder = codecs.getincrementaldecoder('utf-8')('replace')
+
+    def start(self, loop):
+        if self.proc is not None:
+            return
+        self.loop = loop
+        self.started = monotonic()
+        self.proc = subprocess.Popen(self.cmdline,
+                                     shell=True,
+                                     stdin=subprocess.DEVNULL,
+                                     stdout=subprocess.PIPE,
+                                     stderr=subprocess.STDOUT,
+                                     start_new_session=True)
+        self.handle = loop.watch_file(self.proc.stdout.fileno(),
+                                      self.on_output)
+        if self.timeout:
+            self.alarm = loop.set_alarm_in(self.timeout, self.on_timeout)
+
+    def running(self):
+        return self.handle is not None
+
+    def add_line(self, line):
+        if self.placeholder is not None:
+            self.placeholder.set_text(line)
+            self.placeholder = None
+        else:
+            self.pile.contents.append((urwid.Text(line), self.pile.options()))
+
+    def on_output(self):
+        data = os.read(self.proc.stdout.fileno(), 4096)
+        text = self.pending + self.decoder.decode(data, not data)
+        lines = text.split('\n')
+        self.pending = lines.pop()
+        for line in lines:
+            self.add_line(line)
+        if not data:
+            if self.pending:
+                self.add_line(self.pending)
+                self.pending = ''
+            self.finish(None)
+
+    def on_timeout(self, loop, user_data):
+        self.alarm = None
+        self.cancel('[timed out after %ss]' % self.timeout)
+
+    def cancel(self, message='[cancelled]'):
+        if not self.running():
+            return
+        self.signal(signal.SIGTERM)
+        self.kill_at = monotonic() + self.kill_delay
+        self.finish(message)
+
+    def signal(self, sig):
+        try:
+            os.killpg(self.proc.pid, sig)
+        except OSError:
+            pass
+
+    def finish(self, message):
+        self.loop.remove_watch_file(self.handle)
+        self.handle = None
+        if self.alarm is not None:
+            self.loop.remove_alarm(self.alarm)
+            self.alarm = None
+        self.proc.stdout.close()
+        self.reap()
+        if message:
+            self.add_line(('bold', message))
+
+    def reap(self, loop=None, user_data=None):
+        """Collects the exit status of the command from alarms, so that the
+        event loop never waits for it. A cancelled command which ignores
+        SIGTERM is killed after kill_delay seconds.
+        """
+        if self.proc.poll() is not None:
+            self.record()
+            return
+        if self.kill_at is not None and monotonic() >= self.kill_at:
+            self.signal(signal.SIGKILL)
+        self.loop.set_alarm_in(0.1, self.reap)
+
+    def kill(self):
+        """Kills the command if it still runs once the event loop is over
+        """
+        if self.proc is None or self.proc.returncode is not None:
+            return
+        if self.proc.poll() is None:
+            self.signal(signal.SIGKILL)
+            try:
+                self.proc.wait(1)
+            except subprocess.TimeoutExpired:
+                pass
+        self.record()
+
+    def record(self):
+        profiler.record_subprocess('exec', self.cmdline,
+                                   monotonic() - self.started)
+
+
+def slide_frames(rows, direction, count):
+    """Returns _count_ frames of the text _rows_ sliding in from
+    _direction_ ('left', 'right', 'top' or 'bottom'), each frame being a
+    list of rows of the same size
+    """
+    rows = [row.rstrip() for row in rows]
+    width = max([len(row) for row in rows] + [0])
+    rows = [row.ljust(width) for row in rows]
+    height = len(rows)
+    frames = []
+    for i in range(1, count + 1):
+        if direction in ('left', 'right'):
+            shown = width * i // count
+            if direction == 'left':
+                frame = [row[width - shown:].ljust(width) for row in rows]
+            else:
+                frame = [' ' * (width - shown) + row[:shown] for row in rows]
+        else:
+            shown = height * i // count
+            blank = [' ' * width] * (height - shown)
+            if direction == 'top':
+                frame = rows[height - shown:] + blank
+            else:
+                frame = blank + rows[:shown]
+        frames.append(frame)
+    return frames
+
+
+class Animator:
+    """Plays precomputed frames on the urwid event loop. The frame to show
+    is chosen from the elapsed time, so frames are dropped when the loop
+    falls behind the target rate, and the animation never lasts longer than
+    planned.
+    """
+
+    def __init__(self, loop, fps):
+        self.loop = loop
+        self.fps = fps
+        self.tracks = []
+        self.alarm = None
+        self.done = None
+
+    def play(self, tracks, done):
+        """Shows the frames of every (Text widget, frames) of _tracks_ in the
+        widgets, then calls _done_
+        """
+        self.finish()
+        self.tracks = tracks
+        self.done = done
+        self.start = monotonic()
+        self.tick()
+
+    def tick(self, loop=None, user_data=None):
+        self.alarm = None
+        # the epsilon makes sure that the alarm due for a frame shows it
+        index = int((monotonic() - self.start) * self.fps + 1e-6)
+        if index >= max(len(frames) for widget, frames in self.tracks):
+            self.finish()
+            return
+        for widget, frames in self.tracks:
+            widget.set_text('\n'.join(frames[min(index, len(frames) - 1)]))
+        delay = self.start + (index + 1) / self.fps - monotonic()
+        self.alarm = self.loop.set_alarm_in(max(delay, 0), self.tick)
+
+    def finish(self):
+        """Stops the animation, leaving its final state
+        """
+        if self.alarm is not None:
+            self.loop.remove_alarm(self.alarm)
+            self.alarm = None
+        done, self.done = self.done, None
+        self.tracks = []
+        if done is not None:
+            done()
+
+
 class NcursesVisualizer(TppVisualizer):
+    """Implements an interactive visualizer. Pages are only kept as compiled
+    ops while the deck is loaded; their widgets are built when they come near
+    the current slide, and dropped again when they get far from it.
+    """
+
+    STATE_ATTRS = ('figletfont', 'ul', 'bold', 'rev')
+
+    # opcodes which only change STATE_ATTRS, and thus are applied while the
+    # deck is loaded in order to know the starting state of every page
+    STATE_OPCODES = frozenset(('sethugefont', 'ulon', 'uloff', 'boldon',
+                               'boldoff', 'revon', 'revoff'))
+
+    palette = [('body', 'white', 'black', 'standout'),
+               ('footer', 'black', 'light gray'),
+               ('bold', 'default,bold', 'default', 'bold'),
+               ('underline', 'default,underline', 'default', 'underline'),
+               ]
 
-    def __init__(self, outputfile):
+    # seconds after which a running --exec command is stopped
+    exec_timeout = 60
+
+    # target frame rate and length in seconds of --beginslide* transitions
+    animation_fps = 30
+    animation_duration = 0.3
+
+    # number of slides built ahead of and behind the current one
+    prefetch = 2
+
+    # maximum number of slides whose widgets are kept around
+    cache_size = 16
+
+    # seconds between two checks of the source file in watch mode
+    watch_interval = 1
+
+    def __init__(self, outputfile, animation=True):
         # self.figletfont = 'Half Block 7x7'
         self.figletfont = 'standard'
-        self.lines = [[]]
         self.footer = urwid.AttrMap(urwid.Text(''), '')
-        self.page_number = 0
         self.cur_page = 0
         self.ul = False
         self.bold = False
         self.rev = False
+        self.prerenderer = Prerenderer()
+        self.initial_state = self.get_state()
+        self.pages = []
+        self.page_states = [self.initial_state]
+        self.page_hashes = []
+        self.built = OrderedDict()
+        self.frames = {}
+        self.history = []
+        self.jump = ''
+        self.index = SearchIndex()
+        self.query = None
+        self.matches = []
+        self.widgets = []
+        self.page_commands = []
+        self.page_pauses = []
+        self.page_slides = []
+        self.slide = None
+        self.animation = animation
+        self.animator = None
+        # number of segments of the current slide which are shown, or None
+        # when it is shown entirely
+        self.segments = None
+        self.watched = None
+
+    def prepare(self, pages):
+        pages = self.pages = list(pages)
+        self.prerenderer.submit(pages, self.figletfont, 200)
+        self.index = SearchIndex(pages)
+        return pages
+
+    def execute(self, opcode, arg):
+        # slides are built from the pages later, only the state at the start
+        # of each one is needed now
+        if opcode in self.STATE_OPCODES:
+            TppVisualizer.execute(self, opcode, arg)
+        return False
+
+    def finish_loading(self):
+        if not self.pages:
+            self.pages = [Page('')]
+        # new_page() is called after the last page as well
+        del self.page_states[len(self.pages):]
+        self.page_hashes = []
+        for state, page in zip(self.page_states, self.pages):
+            h = hashlib.sha1(repr(state).encode('utf-8', 'surrogateescape'))
+            h.update(page.codes)
+            h.update(page.offsets.tobytes())
+            h.update(page.text.encode('utf-8', 'surrogateescape'))
+            self.page_hashes.append(h.digest())
+
+    def watch(self, path, reload):
+        self.watched = (path, reload)
+
+    def stat_watched(self):
+        try:
+            st = os.stat(self.watched[0])
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def check_watched(self, loop=None, user_data=None):
+        stat = self.stat_watched()
+        if stat is not None and stat != self.watched_stat:
+            self.watched_stat = stat
+            try:
+                pages = self.watched[1]()
+            except Exception:
+                pages = None  # keep the current deck if it can't be read
+            if pages is not None:
+                self.reload_pages(pages)
+        self.loop.set_alarm_in(self.watch_interval, self.check_watched)
+
+    def reload_pages(self, pages):
+        """Replaces the deck by _pages_, keeping the widgets of the slides
+        whose content and starting state did not change, and stays on the
+        current slide.
+        """
+        old = {}
+        for number, page in self.built.items():
+            old[self.page_hashes[number]] = page
+        self.set_state(self.initial_state)
+        self.pages = list(pages)
+        self.page_states = [self.initial_state]
+        self.index = SearchIndex(self.pages)
+        for page in self.pages:
+            for opcode, arg in page:
+                self.execute(opcode, arg)
+            self.new_page()
+        self.finish_loading()
+
+        self.built = OrderedDict()
+        self.frames = {}
+        self.history = [n for n in self.history if n < len(self.pages)]
+        for number, digest in enumerate(self.page_hashes):
+            page = old.pop(digest, None)
+            if page is not None:
+                self.built[number] = page
+        for widgets, commands, pauses, slides in old.values():
+            for command in commands:
+                command.cancel()
+        self.cur_page = min(self.cur_page, len(self.pages) - 1)
+        self.show_page()
+
+    def build_page(self, number):
+        """Replays the ops of page _number_ from its starting state, and
+        returns its widgets, --exec commands, the indexes of the widgets
+        following each '---' pause, and the (direction, start, end) ranges of
+        widgets which slide in.
+        """
+        state = self.get_state()
+        self.set_state(self.page_states[number])
+        self.widgets = []
+        self.page_commands = []
+        self.page_pauses = []
+        self.page_slides = []
+        self.slide = None
+        for opcode, arg in self.pages[number]:
+            TppVisualizer.execute(self, opcode, arg)
+        # close blocks which are left open at the end of the page
+        self.do_endoutput()
+        self.do_endshelloutput()
+        self.do_endslide()
+        pauses = [i for i in self.page_pauses if i < len(self.widgets)]
+        page = (self.widgets, self.page_commands, pauses, self.page_slides)
+        self.set_state(state)
+        return page
+
+    def get_page(self, number):
+        """Returns the widgets, --exec commands, pauses and slide-ins of page
+        _number_, building them if necessary.
+        """
+        page = self.built.get(number)
+        if page is None:
+            page = self.build_page(number)
+            self.built[number] = page
+            self.evict()
+        else:
+            self.built.move_to_end(number)
+        return page
+
+    def evict(self):
+        """Drops the least recently used pages which are outside of the
+        prefetch window, until at most cache_size pages are built.
+        """
+        for number in list(self.built):
+            if len(self.built) <= self.cache_size:
+                break
+            if abs(number - self.cur_page) > self.prefetch:
+                self.frames.pop(number, None)
+                for command in self.built.pop(number)[1]:
+                    command.cancel()
+
+    def prefetch_pages(self, loop=None, user_data=None):
+        for distance in range(1, self.prefetch + 1):
+            for number in (self.cur_page + distance,
+                           self.cur_page - distance):
+                if 0 <= number < len(self.pages):
+                    self.get_page(number)
+
+    def get_frame(self, number):
+        """Returns the body and footer widgets of slide _number_, which are
+        kept as long as the slide is built.
+        """
+        frame = self.frames.get(number)
+        if frame is None:
+            widgets = self.get_page(number)[0]
+            body = urwid.Filler(urwid.Pile(widgets), valign='top')
+            footer = urwid.AttrMap(urwid.Text('Slide [%s/%s]' %
+                                   ((number + 1), len(self.pages))), '')
+            frame = self.frames[number] = (body, footer)
+        else:
+            self.built.move_to_end(number)
+        return frame
+
+    def show_page(self, reveal=True):
+        """Shows the current slide, entirely if _reveal_ is set, or else up
+        to its first pause
+        """
+        body, self.footer = self.get_frame(self.cur_page)
+        self.content = body.original_widget
+        self.show_segments(None if reveal else 1)
+        self.frame.set_body(body)
+        self.frame.set_footer(self.footer)
+        self.start_commands()
+        # build the neighbouring slides once the current one is painted
+        self.loop.set_alarm_in(0, self.prefetch_pages)
+
+    def show_segments(self, count):
+        """Shows the first _count_ segments of the current slide, or all of
+        them if _count_ is None, reusing its widgets
+        """
+        self.stop_animation()
+        widgets, commands, pauses, slides = self.get_page(self.cur_page)
+        if count is not None and count > len(pauses):
+            count = None
+        self.segments = count
+        end = len(widgets) if count is None else pauses[count - 1]
+        options = self.content.options()
+        self.content.contents[:] = [(w, options) for w in widgets[:end]]
+        self.animate(0, end)
+
+    def reveal(self):
+        """Appends the next segment of the current slide to its Pile, so
+        that only the new rows have to be painted. Returns False if the
+        slide was already shown entirely.
+        """
+        if self.segments is None:
+            return False
+        self.stop_animation()
+        widgets, commands, pauses, slides = self.get_page(self.cur_page)
+        start = pauses[self.segments - 1]
+        self.segments += 1
+        if self.segments > len(pauses):
+            self.segments = None
+            end = len(widgets)
+        else:
+            end = pauses[self.segments - 1]
+        options = self.content.options()
+        self.content.contents.extend((w, options) for w in widgets[start:end])
+        self.animate(start, end)
+        return True
+
+    def stop_animation(self):
+        if self.animator is not None:
+            self.animator.finish()
+
+    def animate(self, start, end):
+        """Plays the slide-ins of the current slide which begin among its
+        widgets _start_ to _end_, which have just been shown. Each of them is
+        replaced by a Text showing the frames, which are computed from the
+        canvas of its widgets, until the animation is over.
+        """
+        if not self.animation or self.animator is None:
+            return
+        slides = [(direction, first, min(last, end))
+                  for direction, first, last in self.get_page(self.cur_page)[3]
+                  if start <= first < end]
+        if not slides:
+            return
+        cols = self.loop.screen.get_cols_rows()[0] - 2
+        count = max(1, int(self.animation_duration * self.animation_fps))
+        pile = self.content
+        options = pile.options()
+        tracks = []
+        hidden = []
+        # replace the last ranges first, so that the indexes stay valid
+        for direction, first, last in reversed(slides):
+            widgets = [w for w, o in pile.contents[first:last]]
+            canvas = urwid.Pile(widgets).render((cols,))
+            rows = [row.decode('utf-8', 'replace') for row in canvas.text]
+            text = urwid.Text('', wrap='clip')
+            tracks.append((text, slide_frames(rows, direction, count)))
+            hidden.append((first, widgets))
+            pile.contents[first:last] = [(text, options)]
+
+        def done():
+            for first, widgets in hidden:
+                pile.contents[first:first + 1] = [(w, options)
+                                                  for w in widgets]
+        self.animator.play(tracks, done)
+
+    def goto(self, number, remember=True, reveal=True):
+        """Shows slide _number_, if it exists and is not the current one
+        """
+        number = max(0, min(number, len(self.pages) - 1))
+        if number == self.cur_page:
+            return
+        if remember:
+            self.history.append(self.cur_page)
+        self.cur_page = number
+        self.show_page(reveal)
+
+    def search_input(self, input):
+        """Handles a key while a search query is being typed: the first
+        matching slide from where the search started on is shown as the
+        query changes.
+        """
+        if input == 'esc':
+            self.query = None
+            self.goto(self.search_origin, remember=False)
+            self.frame.set_footer(self.footer)
+            return
+        if input == 'enter':
+            self.query = None
+            self.frame.set_footer(self.footer)
+            return
+        if input == 'backspace':
+            self.query = self.query[:-1]
+        elif isinstance(input, str) and len(input) == 1:
+            self.query += input
+        else:
+            return
+        self.matches = self.index.search(self.query)
+        following = [n for n in self.matches if n >= self.search_origin]
+        if following or self.matches:
+            self.goto((following or self.matches)[0], remember=False)
+        self.frame.set_footer(urwid.AttrMap(
+            urwid.Text('/%s  [%s matching slides]' %
+                       (self.query, len(self.matches))), ''))
+
+    def next_match(self, step):
+        """Shows the next (_step_ = 1) or previous (_step_ = -1) slide
+        matching the last search
+        """
+        if not self.matches:
+            return
+        if step > 0:
+            following = [n for n in self.matches if n > self.cur_page]
+            target = following[0] if following else self.matches[0]
+        else:
+            preceding = [n for n in self.matches if n < self.cur_page]
+            target = preceding[-1] if preceding else self.matches[-1]
+        self.goto(target)
 
     def keyboard_input(self, input):
+        # a key press ends the animation at once, and is handled as usual
+        self.stop_animation()
+        if self.query is not None:
+            self.search_input(input)
+            return
+        if input in ('0', '1', '2', '3', '4', '5', '6', '7', '8', '9'):
+            # slide number for 'g' or enter
+            self.jump += input
+            self.frame.set_footer(urwid.AttrMap(
+                urwid.Text('Go to slide: %s' % self.jump), ''))
+            return
+        jump, self.jump = self.jump, ''
+        if jump:
+            self.frame.set_footer(self.footer)
         if input in ('q', 'Q', 'esc'):
             raise urwid.ExitMainLoop()
-        elif input in (' ', 'down'):
-            if self.cur_page < len(self.pages)-1:
-                self.cur_page += 1
-                self.content = urwid.Pile(self.pages[self.cur_page])
-                self.frame.set_body(urwid.Filler(self.content, valign='top'))
-                self.footer = urwid.AttrMap(urwid.Text('Slide [%s/%s]' %
-                                            ((self.cur_page + 1),
-                                             len(self.pages))), '')
-                self.frame.set_footer(self.footer)
-                self.loop.draw_screen()
-            else:
-                sys.exit(0)
-        elif input is 'up':
-            if self.cur_page < len(self.pages):
-                self.cur_page -= 1
-                self.content = urwid.Pile(self.pages[self.cur_page])
-                self.frame.set_body(urwid.Filler(self.content, valign='top'))
-                self.footer = urwid.AttrMap(urwid.Text('Slide [%s/%s]' %
-                                                       ((self.cur_page + 1),
-                                                        len(self.pages))),
-                                            '')
-                self.frame.set_footer(self.footer)
-                self.loop.draw_screen()
-            else:
+        elif input in ('c', 'C'):
+            for command in self.get_page(self.cur_page)[1]:
+                command.cancel()
+        elif input in (' ', 'down', 'right', 'page down'):
+            if self.reveal():
+                pass
+            elif self.cur_page < len(self.pages)-1:
+                self.goto(self.cur_page + 1, remember=False, reveal=False)
+            elif input == ' ':
                 raise urwid.ExitMainLoop()
+        elif input in ('up', 'left', 'page up'):
+            self.goto(self.cur_page - 1, remember=False)
+        elif input in ('g', 'enter') and jump:
+            self.goto(int(jump) - 1)
+        elif input in ('g', 'home'):
+            self.goto(0)
+        elif input in ('G', 'end'):
+            self.goto(len(self.pages) - 1)
+        elif input in ('b', 'backspace'):
+            if self.history:
+                self.goto(self.history.pop(), remember=False)
+        elif input == '/':
+            self.query = ''
+            self.search_origin = self.cur_page
+            self.history.append(self.cur_page)
+            self.frame.set_footer(urwid.AttrMap(urwid.Text('/'), ''))
+        elif input == 'n':
+            self.next_match(1)
+        elif input == 'N':
+            self.next_match(-1)
+
+    def start_commands(self):
+        """Starts the --exec commands of the current slide which have not been
+        run yet
+        """
+        for command in self.get_page(self.cur_page)[1]:
+            command.start(self.loop)
 
     def do_footer(self, footer_text):
         pass
@@ -71,8 +646,7 @@ class NcursesVisualizer(TppVisualizer):
         pass
 
     def new_page(self):
-        self.lines.append([])
-        self.page_number += 1
+        self.page_states.append(self.get_state())
 
     def do_heading(self, text):
         pass
@@ -81,23 +655,29 @@ class NcursesVisualizer(TppVisualizer):
         pass
 
     def do_horline(self):
-        self.lines[self.page_number].append(urwid.Divider('—'))
+        self.widgets.append(urwid.Divider('—'))
         pass
 
     def do_color(self, text):
         pass
 
     def do_exec(self, cmdline):
-        op = subprocess.Popen(cmdline,
-                              shell=True,
-                              stdout=subprocess.PIPE).stdout
-        for line in op.read().decode().split('\n'):
-            self.print_line(line)
-        op.close()
-        pass
+        command = LiveCommand(cmdline, self.exec_timeout)
+        self.page_commands.append(command)
+        if hasattr(self, 'output'):
+            self.output.append(command.pile)
+        elif hasattr(self, 'shell_output'):
+            self.shell_output.append(command.pile)
+        else:
+            self.widgets.append(
+                urwid.LineBox(command.pile, title=cmdline))
 
     def do_wait(self):
-        pass
+        # blocks are only added once closed, so a pause inside a block
+        # shows the whole block
+        if len(self.widgets) > (self.page_pauses[-1] if self.page_pauses
+                                else 0):
+            self.page_pauses.append(len(self.widgets))
 
     def do_beginoutput(self):
         if not hasattr(self, 'output'):
@@ -110,13 +690,13 @@ class NcursesVisualizer(TppVisualizer):
     def do_endoutput(self):
         if hasattr(self, 'output'):
             output = urwid.LineBox(urwid.Pile(self.output))
-            self.lines[self.page_number].append(output)
+            self.widgets.append(output)
             del self.output
 
     def do_endshelloutput(self):
         if hasattr(self, 'shell_output'):
             output = urwid.LineBox(urwid.Pile(self.shell_output))
-            self.lines[self.page_number].append(output)
+            self.widgets.append(output)
             del self.shell_output
 
     def do_sleep(self, time2sleep):
@@ -140,20 +720,29 @@ class NcursesVisualizer(TppVisualizer):
     def do_uloff(self):
         self.ul = False
 
+    def begin_slide(self, direction):
+        self.do_endslide()
+        self.slide = (direction, len(self.widgets))
+
     def do_beginslideleft(self):
-        pass
+        self.begin_slide('left')
 
     def do_endslide(self):
-        pass
+        if self.slide is not None:
+            direction, start = self.slide
+            if len(self.widgets) > start:
+                self.page_slides.append((direction, start,
+                                         len(self.widgets)))
+            self.slide = None
 
     def do_beginslideright(self):
-        pass
+        self.begin_slide('right')
 
     def do_beginslidetop(self):
-        pass
+        self.begin_slide('top')
 
     def do_beginslidebottom(self):
-        pass
+        self.begin_slide('bottom')
 
     def do_sethugefont(self, text):
         self.figletfont = text
@@ -163,14 +752,10 @@ class NcursesVisualizer(TppVisualizer):
         # bigtext = urwid.Padding(bigtext, 'left', width='clip')
         # bigtext = urwid.Filler(bigtext, 'bottom')
         # bigtext = urwid.BoxAdapter(bigtext, 7)
-        # self.lines[self.page_number].append(bigtext)
-        op = subprocess.Popen('figlet -C utf8 -f %s -w 200 "%s"' %
-                              (self.figletfont, text),
-                              shell=True,
-                              stdout=subprocess.PIPE).stdout
-        for line in op.read().decode().split('\n'):
+        # self.widgets.append(bigtext)
+        output = self.prerenderer.huge(text, self.figletfont, 200)
+        for line in output.split('\n'):
             self.print_line(line)
-        op.close()
 
     def print_line(self, line):
         if self.ul:
@@ -182,7 +767,7 @@ class NcursesVisualizer(TppVisualizer):
         elif hasattr(self, 'shell_output'):
             self.shell_output.append(urwid.Text(line))
         else:
-            self.lines[self.page_number].append(urwid.Text(line))
+            self.widgets.append(urwid.Text(line))
 
     def do_center(self, text):
         if hasattr(self, 'output'):
@@ -190,8 +775,7 @@ class NcursesVisualizer(TppVisualizer):
         elif hasattr(self, 'shell_output'):
             self.shell_output.append(urwid.Text(text, align='center'))
         else:
-            self.lines[self.page_number].append(urwid.Text(text,
-                                                           align='center'))
+            self.widgets.append(urwid.Text(text, align='center'))
 
     def do_right(self, text):
         if hasattr(self, 'output'):
@@ -199,20 +783,16 @@ class NcursesVisualizer(TppVisualizer):
         elif hasattr(self, 'shell_output'):
             self.shell_output.append(urwid.Text(text, align='right'))
         else:
-            self.lines[self.page_number].append(urwid.Text(text,
-                                                           align='right'))
+            self.widgets.append(urwid.Text(text, align='right'))
 
     def do_title(self, title):
-        self.lines[self.page_number].append(urwid.Text(('bold', title),
-                                                       align='center'))
+        self.widgets.append(urwid.Text(('bold', title), align='center'))
 
     def do_author(self, author):
-        self.lines[self.page_number].append(urwid.Text(('bold', author),
-                                                       align='center'))
+        self.widgets.append(urwid.Text(('bold', author), align='center'))
 
     def do_date(self, date):
-        self.lines[self.page_number].append(urwid.Text(('bold', date),
-                                                       align='center'))
+        self.widgets.append(urwid.Text(('bold', date), align='center'))
 
     def do_bgcolor(self, color):
         pass
@@ -221,15 +801,9 @@ class NcursesVisualizer(TppVisualizer):
         pass
 
     def close(self):
-        self.pages = []
-        # for page in self.lines:
-        #     self.pages.append(urwid.Text('\n'.join(page)))
-        self.pages = self.lines
-        # print(self.pages)
-        palette = [('body', 'white', 'black', 'standout'),
-                   ('footer', 'black', 'light gray'),
-                   ]
-        self.content = urwid.Pile(self.pages[0])
+        self.prerenderer.shutdown()
+        self.finish_loading()
+        self.content = urwid.Pile(self.get_page(0)[0])
         self.footer = urwid.AttrMap(urwid.Text('Slide [1/%s]' %
                                     len(self.pages)), '')
 
@@ -237,6 +811,19 @@ class NcursesVisualizer(TppVisualizer):
                                  footer=self.footer)
         self.box = urwid.LineBox(self.frame)
         self.loop = urwid.MainLoop(self.box,
-                                   palette,
+                                   self.palette,
                                    unhandled_input=self.keyboard_input)
-        self.loop.run()
+        self.animator = Animator(self.loop, self.animation_fps)
+        self.show_segments(1)
+        self.start_commands()
+        self.loop.set_alarm_in(0, self.prefetch_pages)
+        if self.watched is not None:
+            self.watched_stat = self.stat_watched()
+            self.loop.set_alarm_in(self.watch_interval, self.check_watched)
+        try:
+            self.loop.run()
+        finally:
+            for widgets, commands, pauses, slides in self.built.values():
+                for command in commands:
+                    command.cancel()
+                    command.kill()
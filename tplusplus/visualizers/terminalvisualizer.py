@@ -0,0 +1,253 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Copyright © 2014 gordon <gordon@starswirl>
+#
+# Distributed under terms of the MIT license.
+
+"""
+Lightweight interactive visualizer for T++, which draws slides with ANSI escape
+sequences on the terminal without urwid
+"""
+
+# first we need to set the sys.path to the project's root folder
+import sys
+sys.path.append('../..')
+
+import os
+import re
+import tty
+import select
+import signal
+import termios
+from collections import OrderedDict
+from tplusplus.core import OPCODE_CODES, Page, TplusplusException
+from tplusplus.controllers.conversioncontroller import NullOutput, PageOutput
+from tplusplus.visualizers.ansivisualizer import AnsiVisualizer
+from tplusplus.visualizers.tppvisualizer import TppVisualizer
+from tplusplus.wrap import char_width
+
+# escape sequences sent by the navigation keys
+KEYS = {
+    '\x1b[A': 'up', '\x1b[B': 'down', '\x1b[C': 'right', '\x1b[D': 'left',
+    '\x1b[5~': 'page up', '\x1b[6~': 'page down',
+    '\x1b[H': 'home', '\x1b[F': 'end', '\x1b[1~': 'home', '\x1b[4~': 'end',
+    '\x1bOA': 'up', '\x1bOB': 'down', '\x1bOC': 'right', '\x1bOD': 'left',
+    '\x1bOH': 'home', '\x1bOF': 'end',
+    '\x1b': 'esc', '\r': 'enter', '\n': 'enter', '\x7f': 'backspace',
+    '\x08': 'backspace', '\x03': 'q',
+}
+
+# the escape sequences written in the rows, and the keys read from the
+# terminal: escape sequences, a lone ESC, or a single character
+CSI = re.compile('(\x1b\\[[0-9;?]*[@-~])')
+KEY = re.compile('\x1b\\[[0-9;?]*[@-~]|\x1bO.|\x1b|.', re.DOTALL)
+
+
+def clip(row, cols):
+    """Returns _row_ cut after _cols_ terminal cells, keeping its escape
+    sequences
+    """
+    out = []
+    width = 0
+    for i, part in enumerate(CSI.split(row)):
+        if i % 2:
+            out.append(part)
+            continue
+        for c in part:
+            width += char_width(c)
+            if width > cols:
+                return ''.join(out)
+            out.append(c)
+    return ''.join(out)
+
+
+class TerminalRenderer(AnsiVisualizer):
+    """Renders a slide for the terminal, wrapping the lines of output blocks
+    so that they fit along with their '| ' prefix
+    """
+
+    def split_lines(self, text, width):
+        if self.output_env:
+            width -= 2
+        return AnsiVisualizer.split_lines(self, text, width)
+
+
+class TerminalVisualizer(TppVisualizer):
+    """Implements an interactive visualizer which renders every slide to
+    rows of ANSI-escaped text for the current terminal size, and only sends
+    the rows which differ from the ones on screen when the slide changes.
+    """
+
+    # number of rendered slides which are kept
+    cache_size = 32
+
+    def __init__(self, outputfile):
+        # follows the state through the deck, to know the starting state of
+        # every slide
+        self.tracker = AnsiVisualizer(NullOutput())
+        self.pages = []
+        self.page_states = [self.tracker.get_state()]
+        self.cur_page = 0
+        self.frames = OrderedDict()
+        self.screen = []
+        self.size = None
+        self.resized = False
+        self.jump = ''
+
+    def prepare(self, pages):
+        pages = self.pages = list(pages)
+        return pages
+
+    def execute(self, opcode, arg):
+        # slides are rendered from the pages later, only the state at the
+        # start of each one is needed now
+        if opcode in self.tracker.STATE_OPCODES:
+            self.tracker.execute(opcode, arg)
+        return False
+
+    def new_page(self):
+        self.page_states.append(self.tracker.get_state())
+
+    def render_page(self, number):
+        """Returns the rows of slide _number_ for the current terminal size,
+        the last one being the status line
+        """
+        cols, rows = self.size
+        output = PageOutput()
+        vis = TerminalRenderer(output)
+        vis.width = cols
+        vis.set_state(self.page_states[number])
+        for opcode, arg in self.pages[number]:
+            vis.execute(opcode, arg)
+        vis.close()
+        lines = output.getvalue().split('\n')[:rows - 1]
+        lines += [''] * (rows - 1 - len(lines))
+        # a row wrapped by the terminal would shift the rows below it, so
+        # they are clipped; then the attributes are reset and what is left
+        # of the row cleared
+        frame = ['%s\033[0m\033[K' % clip(line, cols) for line in lines]
+        status = 'Slide [%s/%s]' % (number + 1, len(self.pages))
+        frame.append('\033[7m%s\033[0m' % status[:cols].ljust(cols))
+        return frame
+
+    def get_frame(self, number):
+        frame = self.frames.get(number)
+        if frame is None:
+            frame = self.frames[number] = self.render_page(number)
+            while len(self.frames) > self.cache_size:
+                self.frames.popitem(last=False)
+        else:
+            self.frames.move_to_end(number)
+        return frame
+
+    def paint(self, frame):
+        """Sends the rows of _frame_ which differ from the screen
+        """
+        out = []
+        for y, row in enumerate(frame):
+            if y >= len(self.screen) or self.screen[y] != row:
+                out.append('\033[%s;1H%s' % (y + 1, row))
+        self.screen = frame
+        if out:
+            self.write(''.join(out))
+
+    def write(self, text):
+        data = text.encode('utf-8', 'replace')
+        while data:
+            data = data[os.write(self.out_fd, data):]
+
+    def show_page(self):
+        size = tuple(os.get_terminal_size(self.out_fd))
+        if size != self.size:
+            # everything has to be rendered and drawn again
+            self.size = size
+            self.frames.clear()
+            self.screen = []
+            self.write('\033[2J')
+        self.paint(self.get_frame(self.cur_page))
+
+    def prefetch(self):
+        """Renders the slide after the current one, while the presenter
+        talks. Slides running commands are left for when they are shown, as
+        they could keep the keys waiting.
+        """
+        number = self.cur_page + 1
+        if number < len(self.pages) and number not in self.frames and \
+                OPCODE_CODES['exec'] not in self.pages[number].codes:
+            self.get_frame(number)
+
+    def goto(self, number):
+        number = max(0, min(number, len(self.pages) - 1))
+        if number != self.cur_page:
+            self.cur_page = number
+            self.show_page()
+
+    def keyboard_input(self, key):
+        """Handles a key, and returns False when the presentation is over
+        """
+        if key in ('0', '1', '2', '3', '4', '5', '6', '7', '8', '9'):
+            self.jump += key
+            return True
+        jump, self.jump = self.jump, ''
+        if key in ('q', 'Q', 'esc'):
+            return False
+        elif key in (' ', 'down', 'right', 'page down', 'j', 'l'):
+            if self.cur_page < len(self.pages) - 1:
+                self.goto(self.cur_page + 1)
+            elif key == ' ':
+                return False
+        elif key in ('up', 'left', 'page up', 'backspace', 'k', 'h'):
+            self.goto(self.cur_page - 1)
+        elif key in ('g', 'enter') and jump:
+            self.goto(int(jump) - 1)
+        elif key in ('g', 'home'):
+            self.goto(0)
+        elif key in ('G', 'end'):
+            self.goto(len(self.pages) - 1)
+        return True
+
+    def read_keys(self):
+        data = os.read(self.in_fd, 64).decode('utf-8', 'replace')
+        # a read may hold several keys, e.g. repeated arrows over ssh
+        return [KEYS.get(key, key) for key in KEY.findall(data)]
+
+    def on_resize(self, signum, frame):
+        self.resized = True
+
+    def close(self):
+        if not self.pages:
+            self.pages = [Page('')]
+        # new_page() is called after the last page as well
+        del self.page_states[len(self.pages):]
+        self.in_fd = sys.stdin.fileno()
+        self.out_fd = sys.stdout.fileno()
+        if not (os.isatty(self.in_fd) and os.isatty(self.out_fd)):
+            raise TplusplusException('Error: the terminal visualizer needs '
+                                     'a terminal')
+        saved = termios.tcgetattr(self.in_fd)
+        previous_handler = signal.signal(signal.SIGWINCH, self.on_resize)
+        try:
+            tty.setraw(self.in_fd)
+            # alternate screen, hidden cursor
+            self.write('\033[?1049h\033[?25l')
+            self.show_page()
+            running = True
+            while running:
+                ready = select.select([self.in_fd], [], [], 0.25)[0]
+                if self.resized:
+                    self.resized = False
+                    self.show_page()
+                if ready:
+                    for key in self.read_keys():
+                        running = self.keyboard_input(key)
+                        if not running:
+                            break
+                else:
+                    # no key is pending
+                    self.prefetch()
+        finally:
+            self.write('\033[0m\033[?25h\033[?1049l')
+            termios.tcsetattr(self.in_fd, termios.TCSADRAIN, saved)
+            signal.signal(signal.SIGWINCH, previous_handler)
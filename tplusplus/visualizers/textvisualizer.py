@@ -14,7 +14,9 @@ Basic text visualizer for T++ (mainly for tests purposes)
 import sys
 sys.path.append('../..')
 
-import subprocess
+from tplusplus.execcache import run_exec
+from tplusplus.figlet import render_figlet
+from tplusplus.wrap import text_width
 from tplusplus.visualizers.tppvisualizer import TppVisualizer
 
 
@@ -23,7 +25,16 @@ class TextVisualizer(TppVisualizer):
     text file which can e.g. be used as handout
     """
 
-    def __init__(self, outputfile):
+    STATE_ATTRS = ('output_env', 'figletfont', 'title', 'author', 'date')
+
+    STATE_OPCODES = frozenset(('beginoutput', 'beginshelloutput',
+                               'endoutput', 'endshelloutput', 'sethugefont',
+                               'title', 'author', 'date'))
+
+    PARALLEL_PAGES = True
+
+    def __init__(self, outputfile, flush_threshold=65536, exec_cache=None,
+                 exec_cwd=None):
         # try:
         #     self.f = open(self.filename, 'w+')
         # except IOError as (errno, strerr):
@@ -31,10 +42,19 @@ class TextVisualizer(TppVisualizer):
         #           .format(errno, strerr))
         #     sys.exit(1)
         self.f = outputfile
+        # pages are assembled in memory, and written out in one go once at
+        # least _flush_threshold_ characters are pending
+        self.flush_threshold = flush_threshold
+        self.buffer = []
+        self.buffered = 0
         self.output_env = False
         self.title = self.author = self.date = False
         self.figletfont = 'small'
         self.width = 80
+        # --exec commands run in _exec_cwd_ through _exec_cache_, or through
+        # the shared cache if it is None
+        self.exec_cache = exec_cache
+        self.exec_cwd = exec_cwd
 
     def do_footer(self, footer_text):
         pass
@@ -45,39 +65,70 @@ class TextVisualizer(TppVisualizer):
     def do_refresh(self):
         pass
 
+    def write(self, text):
+        self.buffer.append(text)
+        self.buffered += len(text)
+
+    def flush(self):
+        if self.buffer:
+            self.f.write(''.join(self.buffer))
+            self.buffer = []
+            self.buffered = 0
+
     def new_page(self):
-        self.f.write('--------------------------------------------\n')
+        self.write('--------------------------------------------\n')
+        if self.buffered >= self.flush_threshold:
+            self.flush()
 
     def do_heading(self, text):
-        self.f.write('\n')
+        self.write('\n')
         for l in self.split_lines(text, self.width):
-            self.f.write('%s\n' % l)
-        self.f.write('~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~\n')
+            self.write('%s\n' % l)
+        self.write('~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~\n')
 
     def do_withborder(self):
         pass
 
     def do_horline(self):
-        self.f.write('********************************************\n')
+        self.write('********************************************\n')
 
     def do_color(self, text):
         pass
 
+    def exec_output(self, cmdline):
+        """Returns the output of _cmdline_, run through the cache of the
+        visualizer
+        """
+        if self.exec_cache is not None:
+            return self.exec_cache.run(cmdline, self.exec_cwd)
+        return run_exec(cmdline, self.exec_cwd)
+
     def do_exec(self, cmdline):
-        pass
+        output = self.exec_output(cmdline)
+        if self.output_env:
+            for line in output.splitlines():
+                self.print_line(line)
+            return
+        # like in the ncurses visualizer, the output of a command outside of
+        # an output block gets its own block
+        self.do_beginoutput()
+        self.write_line('$ %s' % cmdline)
+        for line in output.splitlines():
+            self.print_line(line)
+        self.do_endoutput()
 
     def do_wait(self):
         pass
 
     def do_beginoutput(self):
-        self.f.write('---------------------------\n')
+        self.write('---------------------------\n')
         self.output_env = True
 
     def do_beginshelloutput(self):
         self.do_beginoutput()
 
     def do_endoutput(self):
-        self.f.write('---------------------------\n')
+        self.write('---------------------------\n')
         self.output_env = False
 
     def do_endshelloutput(self):
@@ -127,61 +178,51 @@ class TextVisualizer(TppVisualizer):
         if self.output_env:
             output_width -= 2
         # op = pyfiglet.Figlet(font=self.figletfont, width=output_width)
-        op = subprocess.Popen('figlet -C utf8 -f %s -w %s "%s"' %
-                              (self.figletfont,
-                               output_width,
-                               text),
-                              shell=True,
-                              stdout=subprocess.PIPE).stdout
-        for line in op.read().decode().split('\n'):
+        output = render_figlet(text, self.figletfont, output_width)
+        for line in output.split('\n'):
             self.print_line(line)
-        op.close()
 
     def print_line(self, line):
-        lines = self.split_lines(line, self.width)
-        for l in lines:
-            if self.output_env:
-                self.f.write('| %s\n' % l)
-            else:
-                self.f.write('%s\n' % l)
+        for l in self.split_lines(line, self.width):
+            self.write_line(l)
+
+    def write_line(self, line):
+        """Writes an already wrapped line
+        """
+        if self.output_env:
+            self.write('| %s\n' % line)
+        else:
+            self.write('%s\n' % line)
 
     def do_center(self, text):
         lines = self.split_lines(text, self.width)
         for line in lines:
-            spaces = int((self.width - len(line)) / 2)
-            if spaces < 0:
-                spaces = 0
-            for i in range(spaces):
-                line = ' ' + line
-            self.print_line(line)
+            spaces = (self.width - text_width(line)) // 2
+            self.write_line(' ' * spaces + line)
 
     def do_right(self, text):
         lines = self.split_lines(text, self.width)
         for line in lines:
-            spaces = self.width - len(line)
-            if spaces < 0:
-                spaces = 0
-            for i in range(spaces):
-                line = ' ' + line
-            self.print_line(line)
+            spaces = self.width - text_width(line)
+            self.write_line(' ' * spaces + line)
 
     def do_title(self, title):
-        self.f.write('Title: %s\n' % title)
+        self.write('Title: %s\n' % title)
         self.title = True
         if self.title and self.author and self.date:
-            self.f.write('\n\n')
+            self.write('\n\n')
 
     def do_author(self, author):
-        self.f.write('Author: %s\n' % author)
+        self.write('Author: %s\n' % author)
         self.author = True
         if self.title and self.author and self.date:
-            self.f.write('\n\n')
+            self.write('\n\n')
 
     def do_date(self, date):
-        self.f.write('Date: %s\n' % date)
+        self.write('Date: %s\n' % date)
         self.date = True
         if self.title and self.author and self.date:
-            self.f.write('\n\n')
+            self.write('\n\n')
 
     def do_bgcolor(self, color):
         pass
@@ -190,4 +231,5 @@ class TextVisualizer(TppVisualizer):
         pass
 
     def close(self):
+        self.flush()
         self.f.close()
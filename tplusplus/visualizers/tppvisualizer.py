@@ -14,9 +14,10 @@ Abstract TPP visualization class. All visualizers must inherit from it.
 import sys
 sys.path.append('../..')
 
-import re
 from datetime import datetime
-from tplusplus.core import abstract_method
+from tplusplus.core import abstract_method, compile_line
+from tplusplus.core import DIRECTIVES, TEXT, WAIT
+from tplusplus.wrap import wrap
 
 
 class TppVisualizer:
@@ -24,39 +25,51 @@ class TppVisualizer:
     be derived.
     """
 
+    # names of the attributes which carry over from one page to the next
+    STATE_ATTRS = ()
+
+    # opcodes which change STATE_ATTRS, and which are enough to compute the
+    # starting state of every page without rendering them
+    STATE_OPCODES = frozenset()
+
+    # whether pages can be rendered independently by separate instances,
+    # given their starting state
+    PARALLEL_PAGES = False
+
     def __init__(self):
         pass  # nothing
 
+    def get_state(self):
+        """Returns a snapshot of the attributes listed in STATE_ATTRS
+        """
+        return tuple(getattr(self, name) for name in self.STATE_ATTRS)
+
+    def set_state(self, state):
+        """Restores a snapshot taken by get_state()
+        """
+        for name, value in zip(self.STATE_ATTRS, state):
+            setattr(self, name, value)
+
+    def prepare(self, pages):
+        """Gets a chance to look at the pages before they are visualized, and
+        returns the pages to visualize. As _pages_ may be a generator, the
+        default is to leave it alone.
+        """
+        return pages
+
+    def watch(self, path, reload):
+        """Asks the visualizer to call _reload_, which returns the new pages,
+        whenever the source file _path_ changes. Only interactive visualizers
+        care about it.
+        """
+        pass
+
     def split_lines(self, text, width):
         """Splits a line into several lines, where each of the result lines is
-        at most _width_ characters long, caring about word boundaries, and
+        at most _width_ terminal cells wide, caring about word boundaries, and
         returns a list of strings.
         """
-        lines = []
-        if text:
-            while True:
-                i = width
-                if len(text) <= i:  # text length is OK → add it to array and
-                                    # stop splitting
-                    lines.append(text)
-                    text = ''
-                else:
-                    # search for word boundary (space actually)
-                    while i > 0 and text[i] is not '':
-                        i -= 1
-                    # if we can’t find any space character, simply cut off at
-                    # the maximum width
-                    if i == 0:
-                        i = width
-                    # extract line
-                    x = text[0:i-1]
-                    # remove extracted line
-                    text = text[i+1:-1]
-                    # added line to array
-                    lines.append(x)
-                if len(text) <= 0:
-                    break
-        return lines
+        return list(wrap(text, width))
 
     @abstract_method
     def do_footer(self, footer_text):
@@ -151,7 +164,7 @@ class TppVisualizer:
         pass
 
     @abstract_method
-    def do_beginslieleft(self):
+    def do_beginslideleft(self):
         pass
 
     @abstract_method
@@ -206,102 +219,55 @@ class TppVisualizer:
     def do_fgcolor(self, color):
         pass
 
+    def set_footer(self, footer_text):
+        self.footer_text = footer_text
+        self.do_footer(footer_text)
+
+    def set_header(self, header_text):
+        self.header_text = header_text
+        self.do_header(header_text)
+
+    def set_date(self, date):
+        if date == 'today':
+            date = datetime.now().strftime('%d %b %Y')
+        self.do_date(date)
+
+    @classmethod
+    def get_dispatcher(cls):
+        """Returns the table mapping each opcode to the handler of this
+        visualizer class. The table is only built once per class.
+        """
+        dispatcher = cls.__dict__.get('_dispatcher')
+        if dispatcher is None:
+            dispatcher = {TEXT: (cls.print_line, True),
+                          WAIT: (cls.do_wait, False)}
+            for word, (name, needs_arg) in DIRECTIVES.items():
+                dispatcher[word] = (getattr(cls, name), needs_arg)
+            cls._dispatcher = dispatcher
+        return dispatcher
+
+    def execute(self, opcode, arg):
+        """Replays a compiled (opcode, argument) tuple by calling the
+        matching handler. It returns whether the controller shall wait for
+        input.
+        """
+        if opcode == TEXT:
+            self.print_line(arg)
+            return False
+        handler, needs_arg = self.get_dispatcher()[opcode]
+        if needs_arg:
+            handler(self, arg)
+        else:
+            handler(self)
+        return opcode == WAIT
+
     def visualize(self, line, eop):
         """Receives a _line_, parses it if necessary, and dispatches it
         to the correct method which then does the correct processing.
         It returns whether the controller shall wait for input.
         """
-        if re.match('^--heading ', line):
-            text = line[9:]
-            self.do_heading(text)
-        elif re.match('^--withborder', line):
-            self.do_withborder()
-        elif re.match('^--horline', line):
-            self.do_horline()
-        elif re.match('^--color ', line):
-            text = line[8:].strip()
-            self.do_color(text)
-        elif re.match('^--center ', line):
-            text = line[9:].strip()
-            self.do_center(text)
-        elif re.match('^--right ', line):
-            text = line[9:].strip()
-            self.do_color(text)
-        elif re.match('^--exec ', line):
-            cmdline = line[6:].strip()
-            self.do_exec(cmdline)
-        elif re.match('^---', line):
-            self.do_wait()
-            return True
-        elif re.match('^--beginoutput', line):
-            self.do_beginoutput()
-        elif re.match('^--beginshelloutput', line):
-            self.do_beginshelloutput()
-        elif re.match('^--endoutput', line):
-            self.do_endoutput()
-        elif re.match('^--endshelloutput', line):
-            self.do_endshelloutput()
-        elif re.match('^--sleep ', line):
-            time2sleep = line[8:].strip()
-            self.do_sleep(time2sleep)
-        elif re.match('^--boldon', line):
-            self.do_boldon()
-        elif re.match('^--boldoff', line):
-            self.do_boldoff()
-        elif re.match('^--revon', line):
-            self.do_revon()
-        elif re.match('^--revoff', line):
-            self.do_revoff()
-        elif re.match('^--ulon', line):
-            self.do_ulon()
-        elif re.match('^--uloff', line):
-            self.do_uloff()
-        elif re.match('^--beginslideleft', line):
-            self.do_beginslideleft()
-        elif re.match('^--endslide', line):
-            self.do_endslide()
-        elif re.match('^--beginslideright', line):
-            self.do_beginslideright()
-        elif re.match('^--beginslidetop', line):
-            self.do_beginslidetop()
-        elif re.match('^--beginslidebottom', line):
-            self.do_beginslidebottom()
-        elif re.match('^--sethugefont ', line):
-            params = line[13:].strip()
-            self.do_sethugefont(params)
-        elif re.match('^--huge', line):
-            figlet_text = line[6:].strip()
-            self.do_huge(figlet_text)
-        elif re.match('^--footer ', line):
-            self.footer_txt = line[8:].strip()
-            self.do_footer(self.footer_text)
-        elif re.match('^--header ', line):
-            self.header_txt = line[8:].strip()
-            self.do_header(self.header_text)
-        elif re.match('^--title ', line):
-            title = line[8:].strip()
-            self.do_title(title)
-        elif re.match('^--author ', line):
-            title = line[9:].strip()
-            self.do_author(title)
-        elif re.match('^--date ', line):
-            date = line[7:].strip()
-            if date == 'today':
-                date = datetime.datetime.now().strftime('%d %b %Y')
-            self.do_date(date)
-        elif re.match('^--bgcolor ', line):
-            color = line[10:].strip()
-            self.do_bgcolor(color)
-        elif re.match('^--fgcolor ', line):
-            color = line[10:].strip()
-            self.do_fgcolor(color)
-        elif re.match('^--color ', line):
-            color = line[8:].strip()
-            self.do_color(color)
-        else:
-            self.print_line(line)
-
-        return False
+        opcode, arg = compile_line(line)
+        return self.execute(opcode, arg)
 
     def close(self):
         pass
@@ -0,0 +1,81 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Copyright © 2014 Damien Nicolas <damien@gordon.re>
+#
+# Distributed under terms of the MIT license.
+
+"""
+Word wrapping measured in terminal cells, shared by all visualizers
+"""
+
+from functools import lru_cache
+from unicodedata import combining, east_asian_width
+
+
+@lru_cache(maxsize=1024)
+def char_width(c):
+    """Returns the number of terminal cells taken by the character _c_
+    """
+    if combining(c) or c == '\u200b':
+        return 0
+    if east_asian_width(c) in ('W', 'F'):
+        return 2
+    return 1
+
+
+def text_width(text):
+    """Returns the number of terminal cells taken by _text_
+    """
+    if text.isascii():
+        return len(text)
+    return sum(char_width(c) for c in text)
+
+
+@lru_cache(maxsize=4096)
+def wrap(text, width):
+    """Splits _text_ into lines at most _width_ cells wide, breaking at the
+    last space which fits, or in the middle of words longer than _width_.
+    The spaces at a break are dropped, those starting _text_ are kept.
+    Returns a tuple of strings, which is empty for an empty _text_.
+    """
+    if not text:
+        return ()
+    ascii = text.isascii()
+    if ascii and len(text) <= width:
+        return (text,)
+
+    lines = []
+    start = 0     # index of the first character of the current line
+    cur = 0       # width of text[start:i]
+    space = -1    # index of the last space of the current line
+    after = 0     # width of text[space + 1:i]
+    skip = False  # whether the spaces following a break are being dropped
+    for i, c in enumerate(text):
+        if skip:
+            if c == ' ':
+                continue
+            start, skip = i, False
+        w = 1 if ascii else char_width(c)
+        if cur + w > width and cur > 0:
+            if c == ' ':
+                # break on these spaces, and drop them
+                lines.append(text[start:i].rstrip(' ') or text[start:i])
+                cur, space, after, skip = 0, -1, 0, True
+                continue
+            if space > start and text[start:space].strip(' '):
+                lines.append(text[start:space].rstrip(' '))
+                start, cur = space + 1, after
+            if cur + w > width and cur > 0:
+                lines.append(text[start:i])
+                start, cur = i, 0
+            space, after = -1, cur
+        if c == ' ':
+            space, after = i, 0
+        else:
+            after += w
+        cur += w
+    if not skip and start < len(text):
+        lines.append(text[start:])
+    return tuple(lines)